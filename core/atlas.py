@@ -0,0 +1,347 @@
+import bisect
+import numpy as np
+from .palette import (MAX_COLORS, pack_colors, unpack_colors, image_palette, remap_colors,
+                      to_indexed_image)
+from .tileset import grid_shape, image_to_array, slice_tiles, tiles_to_block
+
+
+class AtlasSheet:
+    """A tileset packed into the atlas, owning a contiguous range of global tile ids"""
+    def __init__(self, name, x, y, columns, rows, tile_width, tile_height, first_id, spacing=0):
+        self.name = name
+        self.x = x
+        self.y = y
+        self.columns = columns
+        self.rows = rows
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.first_id = first_id
+        self.spacing = spacing  # Gap between tiles in the source image, not in the atlas
+
+    @property
+    def geometry(self):
+        """The (tile_width, tile_height, spacing) the sheet was sliced with"""
+        return self.tile_width, self.tile_height, self.spacing
+
+    @property
+    def tile_count(self):
+        return self.columns * self.rows
+
+    @property
+    def width(self):
+        return self.columns * self.tile_width
+
+    @property
+    def height(self):
+        return self.rows * self.tile_height
+
+    def tile_ids(self):
+        return range(self.first_id, self.first_id + self.tile_count)
+
+    def tile_rect(self, tile_id):
+        """Returns (x, y, width, height) of a tile in atlas coordinates"""
+        index = tile_id - self.first_id
+        row, col = divmod(index, self.columns)
+        return (self.x + col * self.tile_width, self.y + row * self.tile_height,
+                self.tile_width, self.tile_height)
+
+
+class TileAtlas:
+    """Packs several tilesets into one RGBA buffer addressed by global tile id.
+
+    Sheets are placed with guillotine bin packing; adding or removing a sheet
+    only touches its own rectangle. Global ids are never reused, so removing a
+    sheet does not shift the ids of the others.
+
+    When indexed, the buffer holds one byte per pixel indexing a palette shared by
+    every sheet, with entry 0 transparent, and pixels are expanded to RGBA only when
+    read out. A sheet that would take the palette past 256 colors turns the atlas
+    back to RGBA.
+    """
+    def __init__(self, padding=2, initial_size=256, indexed=False):
+        self.padding = padding
+        self.palette = np.zeros((1, 4), dtype=np.uint8) if indexed else None
+        self.buffer = np.zeros((initial_size, initial_size, 1 if indexed else 4), dtype=np.uint8)
+        self.sheets = {}
+        self._free_rects = [(0, 0, initial_size, initial_size)]
+        self._id_starts = []
+        self._id_sheets = []
+        self._next_id = 0
+
+    @property
+    def indexed(self):
+        return self.palette is not None
+
+    @property
+    def width(self):
+        return self.buffer.shape[1]
+
+    @property
+    def height(self):
+        return self.buffer.shape[0]
+
+    def add_tileset(self, name, image, tile_width, tile_height, spacing=0):
+        """Slices an image into tiles and packs it; replaces a sheet with the same name.
+        Raises ValueError, keeping any sheet it would replace, when no tile fits.
+        """
+        rows, cols = grid_shape(image.width, image.height, tile_width, tile_height, spacing)
+        if rows == 0 or cols == 0:
+            raise ValueError("Tileset is smaller than a single tile")
+        if name in self.sheets:
+            self.remove_tileset(name)
+
+        tiles = slice_tiles(self._sheet_source(image), tile_width, tile_height, spacing)
+
+        block = tiles_to_block(tiles)
+        x, y = self._allocate(block.shape[1] + self.padding, block.shape[0] + self.padding)
+        self.buffer[y:y + block.shape[0], x:x + block.shape[1]] = block
+
+        sheet = AtlasSheet(name, x, y, cols, rows, tile_width, tile_height, self._next_id,
+                           spacing)
+        self._next_id += sheet.tile_count
+        self.sheets[name] = sheet
+        self._id_starts.append(sheet.first_id)
+        self._id_sheets.append(sheet)
+        return sheet
+
+    def update_tiles(self, name, pixels, indices, spacing=0, palette=None):
+        """Copies the given tiles of a sheet's new pixels into its rectangle, in place.
+        pixels are indices into palette when one is given. Returns the global ids of
+        the updated tiles.
+        """
+        sheet = self.sheets[name]
+        rows, cols = np.divmod(np.asarray(indices, dtype=np.int64), sheet.columns)
+        tiles = slice_tiles(pixels, sheet.tile_width, sheet.tile_height, spacing)[rows, cols]
+        if palette is not None:
+            tiles = palette[tiles[..., 0]]
+        tile_ids = [sheet.first_id + int(index) for index in indices]
+        if self.indexed:
+            # Cleared first, so colors only the old tiles used can be reclaimed
+            for tile_id in tile_ids:
+                x, y, width, height = sheet.tile_rect(tile_id)
+                self.buffer[y:y + height, x:x + width] = 0
+            tiles = self._index_pixels(tiles)
+        for tile_id, tile in zip(tile_ids, tiles):
+            x, y, width, height = sheet.tile_rect(tile_id)
+            self.buffer[y:y + height, x:x + width] = tile
+        return tile_ids
+
+    def set_indexed(self, indexed):
+        """Switches the buffer between palette indices and RGBA in place, keeping every id.
+        Returns False when the atlas holds too many colors to be indexed.
+        """
+        if indexed == self.indexed:
+            return True
+        if not indexed:
+            self.buffer = self.expand(self.buffer)
+            self.palette = None
+            return True
+
+        words = pack_colors(self.buffer)
+        # Sorted, so transparent black (word 0), the color of free space, comes first
+        colors = np.unique(np.concatenate(([0], words.ravel())).astype(np.uint32))
+        if len(colors) > MAX_COLORS:
+            return False
+        self.palette = unpack_colors(colors).reshape(-1, 4)
+        self.buffer = np.searchsorted(colors, words).astype(np.uint8)[..., None]
+        return True
+
+    def expand(self, pixels):
+        """Expands buffer data to RGBA, a no-op unless the atlas is indexed"""
+        if not self.indexed:
+            return pixels
+        # Gathering whole 4-byte words is faster than gathering (colors, 4) rows
+        return unpack_colors(pack_colors(self.palette)[pixels[..., 0]])
+
+    def _sheet_source(self, image):
+        """The sheet as buffer data: palette indices when indexed, RGBA pixels otherwise"""
+        if self.indexed:
+            indexed = to_indexed_image(image)
+            if indexed is not None:
+                indices = np.asarray(indexed)
+                palette = image_palette(indexed)
+                # Palette images often carry a full 256 entry palette, only merge what is drawn
+                used = np.flatnonzero(np.bincount(indices.ravel(), minlength=len(palette)))
+                mapping = self._merge_palette(palette[used])
+                if mapping is not None:
+                    lookup = np.zeros(len(palette), dtype=np.uint8)
+                    lookup[used] = mapping
+                    return lookup[indices][..., None]
+            self.set_indexed(False)
+        return image_to_array(image)
+
+    def _index_pixels(self, pixels):
+        colors = unpack_colors(np.unique(pack_colors(pixels))).reshape(-1, 4)
+        if self._merge_palette(colors) is None:
+            self.set_indexed(False)
+            return pixels
+        return remap_colors(pixels, self.palette)[..., None]
+
+    def _merge_palette(self, colors):
+        """Adds the colors missing from the palette and returns where each one landed,
+        or None, leaving the palette untouched, when they do not all fit even once the
+        colors no tile uses any more are dropped
+        """
+        mapping = self._try_merge_palette(colors)
+        if mapping is None and self._compact_palette():
+            mapping = self._try_merge_palette(colors)
+        return mapping
+
+    def _try_merge_palette(self, colors):
+        known = {int(word): index for index, word in enumerate(pack_colors(self.palette))}
+        added = []
+        mapping = np.zeros(len(colors), dtype=np.uint8)
+        for position, word in enumerate(pack_colors(colors).tolist()):
+            if word not in known:
+                known[word] = len(self.palette) + len(added)
+                added.append(word)
+            if known[word] >= MAX_COLORS:
+                return None
+            mapping[position] = known[word]
+        if added:
+            self.palette = np.concatenate([self.palette, unpack_colors(np.array(added)).reshape(-1, 4)])
+        return mapping
+
+    def _compact_palette(self):
+        """Drops the palette entries no pixel of the buffer uses, renumbering the buffer.
+        Returns whether any entry was dropped.
+        """
+        used = np.bincount(self.buffer.ravel(), minlength=len(self.palette)) > 0
+        used[0] = True  # Free space stays transparent
+        if used.all():
+            return False
+        renumber = (np.cumsum(used) - 1).astype(np.uint8)
+        self.palette = self.palette[used]
+        self.buffer = renumber[self.buffer]
+        return True
+
+    def remove_tileset(self, name):
+        sheet = self.sheets.pop(name)
+        index = self._id_sheets.index(sheet)
+        del self._id_starts[index]
+        del self._id_sheets[index]
+
+        self.buffer[sheet.y:sheet.y + sheet.height, sheet.x:sheet.x + sheet.width] = 0
+        self._free_rects.append((sheet.x, sheet.y, sheet.width + self.padding,
+                                 sheet.height + self.padding))
+        self._merge_free_rects()
+        if self.indexed:
+            self._compact_palette()
+
+    def sheet_for(self, tile_id):
+        index = bisect.bisect_right(self._id_starts, tile_id) - 1
+        if index >= 0:
+            sheet = self._id_sheets[index]
+            if tile_id < sheet.first_id + sheet.tile_count:
+                return sheet
+        raise KeyError(f"Unknown tile id {tile_id}")
+
+    def tile_rect(self, tile_id):
+        return self.sheet_for(tile_id).tile_rect(tile_id)
+
+    def tile_data(self, tile_id):
+        """Returns a view of a tile inside the atlas buffer, palette indices when indexed"""
+        x, y, width, height = self.tile_rect(tile_id)
+        return self.buffer[y:y + height, x:x + width]
+
+    def tile_pixels(self, tile_id):
+        """Returns a tile's RGBA pixels, a view into the buffer unless indexed"""
+        return self.expand(self.tile_data(tile_id))
+
+    def compose_room(self, grid, tile_width, tile_height, cell_width=None, cell_height=None):
+        """Composes a grid of global tile ids (-1 for empty) into one RGBA image.
+        Tiles are resampled to cell_width x cell_height when given, nearest neighbour.
+        """
+        return self.expand(self.compose_room_data(grid, tile_width, tile_height,
+                                                  cell_width, cell_height))
+
+    def compose_room_data(self, grid, tile_width, tile_height, cell_width=None, cell_height=None):
+        """Composes a room as buffer data, so indexed rooms stay one byte per pixel"""
+        grid = np.asarray(grid)
+        cell_width = cell_width or tile_width
+        cell_height = cell_height or tile_height
+        # Source row and column of every cell pixel, to shrink tiles before they are laid out
+        sample_rows = np.arange(cell_height) * tile_height // cell_height
+        sample_cols = np.arange(cell_width) * tile_width // cell_width
+        resample = (cell_width, cell_height) != (tile_width, tile_height)
+
+        channels = self.buffer.shape[2]
+        ids, inverse = np.unique(grid, return_inverse=True)
+        stack = np.zeros((len(ids), cell_height, cell_width, channels), dtype=np.uint8)
+        for index, tile_id in enumerate(ids):
+            if tile_id >= 0:
+                pixels = self.tile_data(int(tile_id))
+                if pixels.shape[:2] != (tile_height, tile_width):
+                    raise ValueError(f"Tile {tile_id} does not match the room tile size")
+                stack[index] = pixels[sample_rows[:, None], sample_cols] if resample else pixels
+
+        rows, cols = grid.shape
+        tiles = stack[inverse.reshape(-1)].reshape(rows, cols, cell_height, cell_width, channels)
+        return tiles_to_block(tiles)
+
+    def _allocate(self, width, height):
+        while True:
+            best = None
+            for index, (fx, fy, fw, fh) in enumerate(self._free_rects):
+                if width <= fw and height <= fh:
+                    waste = fw * fh - width * height
+                    if best is None or waste < best[0]:
+                        best = (waste, index)
+            if best is not None:
+                return self._split(best[1], width, height)
+            self._grow(width, height)
+
+    def _split(self, index, width, height):
+        fx, fy, fw, fh = self._free_rects.pop(index)
+        right_w = fw - width
+        bottom_h = fh - height
+        # Split along the shorter leftover axis to keep free rectangles large
+        if right_w < bottom_h:
+            right = (fx + width, fy, right_w, height)
+            bottom = (fx, fy + height, fw, bottom_h)
+        else:
+            right = (fx + width, fy, right_w, fh)
+            bottom = (fx, fy + height, width, bottom_h)
+        for rect in (right, bottom):
+            if rect[2] > 0 and rect[3] > 0:
+                self._free_rects.append(rect)
+        return fx, fy
+
+    def _grow(self, width, height):
+        old_h, old_w = self.buffer.shape[:2]
+        new_w, new_h = old_w, old_h
+        while new_w < width or new_h < height or (new_w, new_h) == (old_w, old_h):
+            if new_w <= new_h:
+                new_w *= 2
+            else:
+                new_h *= 2
+
+        buffer = np.zeros((new_h, new_w, self.buffer.shape[2]), dtype=np.uint8)
+        buffer[:old_h, :old_w] = self.buffer
+        self.buffer = buffer
+        if new_w > old_w:
+            self._free_rects.append((old_w, 0, new_w - old_w, old_h))
+        if new_h > old_h:
+            self._free_rects.append((0, old_h, new_w, new_h - old_h))
+        self._merge_free_rects()
+
+    def _merge_free_rects(self):
+        merged = True
+        while merged:
+            merged = False
+            rects = self._free_rects
+            for i in range(len(rects)):
+                ax, ay, aw, ah = rects[i]
+                for j in range(i + 1, len(rects)):
+                    bx, by, bw, bh = rects[j]
+                    if ay == by and ah == bh and (ax + aw == bx or bx + bw == ax):
+                        rects[i] = (min(ax, bx), ay, aw + bw, ah)
+                    elif ax == bx and aw == bw and (ay + ah == by or by + bh == ay):
+                        rects[i] = (ax, min(ay, by), aw, ah + bh)
+                    else:
+                        continue
+                    del rects[j]
+                    merged = True
+                    break
+                if merged:
+                    break
@@ -0,0 +1,32 @@
+import numpy as np
+
+
+def count_neighbors(cells):
+    """Counts the 8 neighbors of every cell, treating the outside of the grid as filled"""
+    padded = np.pad(cells.astype(np.uint8), 1, constant_values=1)
+    height, width = cells.shape
+    counts = np.zeros((height, width), dtype=np.uint8)
+    for dy in (0, 1, 2):
+        for dx in (0, 1, 2):
+            if dy != 1 or dx != 1:
+                counts += padded[dy:dy + height, dx:dx + width]
+    return counts
+
+
+def smooth(walls, birth=5, survival=4):
+    """Runs one cellular automata step over the whole grid"""
+    counts = count_neighbors(walls)
+    return np.where(walls, counts >= survival, counts >= birth)
+
+
+def generate_cave(width, height, fill_ratio=0.45, iterations=5, birth=5, survival=4, seed=None):
+    """Returns a (height, width) bool array where True marks solid rock"""
+    rng = np.random.default_rng(seed)
+    walls = rng.random((height, width)) < fill_ratio
+    for _ in range(iterations):
+        walls = smooth(walls, birth, survival)
+    return walls
+
+
+def cave_to_tiles(walls, wall_tile, floor_tile):
+    return np.where(walls, wall_tile, floor_tile).astype(np.int32)
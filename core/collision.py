@@ -0,0 +1,59 @@
+import base64
+import json
+import numpy as np
+from .properties import FLAG_NAMES
+
+
+def row_runs(row):
+    """Returns the (starts, ends) of the True runs of a bool row, ends exclusive"""
+    edges = np.diff(np.concatenate(([0], row.view(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def merge_rectangles(mask):
+    """Covers the True cells of a mask with few axis-aligned (x, y, width, height) rectangles.
+
+    Greedy meshing: the first uncovered run of each row is taken at full width and grown
+    down for as long as every cell under it is set and uncovered.
+    """
+    remaining = np.array(mask, dtype=bool)
+    height = remaining.shape[0]
+    rectangles = []
+    for y in range(height):
+        row = remaining[y]
+        if not row.any():
+            continue
+        for start, end in zip(*row_runs(row)):
+            below = remaining[y + 1:, start:end].all(axis=1)
+            grow = len(below) if below.all() else int(np.argmin(below))
+            remaining[y:y + 1 + grow, start:end] = False
+            rectangles.append((int(start), y, int(end - start), grow + 1))
+    return rectangles
+
+
+def export_collision(grid, properties, tile_width, tile_height, flags=None):
+    """Builds the collision export of a room: every flag layer bit-packed, plus its
+    merged rectangles in pixels, ready to be written as JSON for the runtime.
+    """
+    grid = np.asarray(grid)
+    layers = {}
+    for flag, layer in properties.room_layers(grid, flags).items():
+        rectangles = merge_rectangles(layer.to_mask())
+        layers[FLAG_NAMES[flag].lower()] = {
+            "flag": flag,
+            "bits": base64.b64encode(layer.bits.tobytes()).decode("ascii"),
+            "rectangles": [[x * tile_width, y * tile_height, w * tile_width, h * tile_height]
+                           for x, y, w, h in rectangles],
+        }
+    return {
+        "width": grid.shape[1],
+        "height": grid.shape[0],
+        "tile_width": tile_width,
+        "tile_height": tile_height,
+        "layers": layers,
+    }
+
+
+def write_collision(path, grid, properties, tile_width, tile_height, flags=None):
+    with open(path, "w") as file:
+        json.dump(export_collision(grid, properties, tile_width, tile_height, flags), file)
@@ -0,0 +1,97 @@
+import numpy as np
+from .properties import SOLID, DOOR
+
+
+def _union_find(count, a, b):
+    """Returns the root of every node after joining each (a[i], b[i]) edge.
+
+    Vectorized: every round hooks each edge's roots onto the smaller one and then
+    compresses paths by pointer jumping, so it needs few passes over the edges.
+    """
+    parent = np.arange(count)
+    while len(a):
+        root_a = parent[a]
+        root_b = parent[b]
+        differs = root_a != root_b
+        if not differs.any():
+            break
+        a, b = a[differs], b[differs]
+        root_a, root_b = root_a[differs], root_b[differs]
+        np.minimum.at(parent, np.maximum(root_a, root_b), np.minimum(root_a, root_b))
+        while True:
+            grand = parent[parent]
+            if (grand == parent).all():
+                break
+            parent = grand
+    return parent
+
+
+def label_components(mask):
+    """Labels 4-connected regions of True cells.
+
+    Returns a grid of component labels (-1 outside the mask) numbered from 0 and the
+    component count. Cells are first grouped into horizontal runs, so union-find only
+    has to join runs that touch between rows.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    height, width = mask.shape
+    starts = mask.copy()
+    starts[:, 1:] &= ~mask[:, :-1]
+    run_of = np.cumsum(starts.ravel()) - 1
+    run_count = int(run_of[-1]) + 1 if mask.size else 0
+
+    # A vertical link is implied by the one to its left when both rows continue the same runs
+    down = mask[:-1] & mask[1:]
+    links = down.copy()
+    links[:, 1:] &= ~down[:, :-1]
+    ys, xs = np.nonzero(links)
+    top = run_of[ys * width + xs]
+    bottom = run_of[(ys + 1) * width + xs]
+
+    roots = _union_find(run_count, top, bottom)
+    unique_roots, run_labels = np.unique(roots, return_inverse=True)
+
+    labels = np.full(mask.size, -1, dtype=np.int64)
+    flat = mask.ravel()
+    labels[flat] = run_labels.reshape(-1)[run_of[flat]]
+    return labels.reshape(mask.shape), len(unique_roots)
+
+
+class RoomValidation:
+    """Reachability of a room: which walkable cells can be reached from its doors"""
+    def __init__(self, walkable, labels, components, doors, reachable, unreachable):
+        self.walkable = walkable
+        self.labels = labels
+        self.components = components
+        self.doors = doors
+        self.reachable = reachable
+        self.unreachable = unreachable
+
+
+def validate_room(grid, properties):
+    """Checks that every door reaches every other door through walkable tiles.
+
+    Without doors, the room must be a single walkable region. Cells outside the
+    doors' region (or the largest one) are reported as unreachable.
+    """
+    grid = np.asarray(grid)
+    walkable = (grid >= 0) & ~properties.layer(grid, SOLID)
+    doors = properties.layer(grid, DOOR) & walkable
+    labels, components = label_components(walkable)
+
+    door_labels = np.unique(labels[doors])
+    if len(door_labels):
+        reachable = len(door_labels) == 1
+        main = door_labels
+    elif components:
+        reachable = components == 1
+        main = [np.bincount(labels[walkable]).argmax()]
+    else:
+        reachable = False
+        main = []
+
+    in_main = np.zeros(components + 1, dtype=bool)
+    in_main[main] = True
+    # Labels are -1 outside the walkable cells, which maps onto the spare last entry
+    unreachable = walkable & ~in_main[labels]
+    return RoomValidation(walkable, labels, components, np.argwhere(doors), reachable, unreachable)
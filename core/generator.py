@@ -0,0 +1,74 @@
+from .cave import generate_cave, cave_to_tiles
+from .wfc import solve
+from .world import generate_world
+
+CONSTRAINT = "constraint"
+CAVE = "cave"
+WORLD = "world"
+MODES = (CONSTRAINT, CAVE, WORLD)
+
+# Room sizes each mode handles, caves are cheap and worlds are split into chunks
+MIN_ROOM_SIZE = 5
+MAX_ROOM_SIZE = {CONSTRAINT: 100, CAVE: 1000, WORLD: 4096}
+MIN_CHUNK_SIZE = 16
+MAX_CHUNK_SIZE = 256
+MAX_ITERATIONS = 20
+
+
+class GenerationSettings:
+    """Everything needed to reproduce a generated room"""
+    def __init__(self, width=20, height=15, mode=CONSTRAINT, seed=0,
+                 iterations=5, fill_ratio=0.45, wall_tile=0, floor_tile=1,
+                 chunk_size=64):
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.seed = seed
+        self.iterations = iterations
+        self.fill_ratio = fill_ratio
+        self.wall_tile = wall_tile
+        self.floor_tile = floor_tile
+        self.chunk_size = chunk_size
+
+    def validate(self):
+        """Raises ValueError for settings outside what the generators are meant to handle"""
+        if self.mode not in MODES:
+            raise ValueError(f"Unknown mode '{self.mode}', expected one of {', '.join(MODES)}")
+        maximum = MAX_ROOM_SIZE[self.mode]
+        for name in ("width", "height"):
+            if not MIN_ROOM_SIZE <= getattr(self, name) <= maximum:
+                raise ValueError(f"{name} must be between {MIN_ROOM_SIZE} and {maximum} "
+                                 f"in {self.mode} mode")
+        if not MIN_CHUNK_SIZE <= self.chunk_size <= MAX_CHUNK_SIZE:
+            raise ValueError(f"chunk_size must be between {MIN_CHUNK_SIZE} and {MAX_CHUNK_SIZE}")
+        if not 0 <= self.iterations <= MAX_ITERATIONS:
+            raise ValueError(f"iterations must be between 0 and {MAX_ITERATIONS}")
+        if not 0 <= self.fill_ratio <= 1:
+            raise ValueError("fill_ratio must be between 0 and 1")
+        if not 0 <= self.seed < 2 ** 31:
+            raise ValueError("seed must be between 0 and 2^31 - 1")
+        return self
+
+    def with_seed(self, seed):
+        settings = GenerationSettings(**vars(self))
+        settings.seed = seed
+        return settings
+
+
+def generate(settings, rules=None, on_collapse=None, on_restart=None, on_chunk=None):
+    """Generates a room as a (height, width) int32 grid of global tile ids.
+
+    on_collapse and on_restart follow single room solving, on_chunk follows world mode.
+    """
+    if settings.mode == CAVE:
+        walls = generate_cave(settings.width, settings.height, settings.fill_ratio,
+                              settings.iterations, seed=settings.seed)
+        return cave_to_tiles(walls, settings.wall_tile, settings.floor_tile)
+
+    if rules is None:
+        raise ValueError("Constraint solving needs adjacency rules")
+    if settings.mode == WORLD:
+        return generate_world(settings.width, settings.height, rules, settings.seed,
+                              settings.chunk_size, on_chunk=on_chunk)
+    return solve(settings.width, settings.height, rules, seed=settings.seed,
+                 on_collapse=on_collapse, on_restart=on_restart)
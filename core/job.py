@@ -0,0 +1,149 @@
+import queue
+import threading
+import time
+import numpy as np
+from .generator import generate
+from .room_cache import room_key
+from .scoring import generate_best
+
+# Event kinds posted to GenerationJob.events
+BATCH = "batch"  # (BATCH, ys, xs, tile_ids) of newly decided cells
+CHUNK = "chunk"  # (CHUNK, y, x, tiles) a whole block of cells from world mode
+RESET = "reset"  # (RESET,) the solver started over, drop everything shown so far
+DONE = "done"  # (DONE, grid)
+FAILED = "failed"  # (FAILED, message)
+CANCELLED = "cancelled"  # (CANCELLED,)
+
+
+class GenerationCancelled(Exception):
+    """Raised inside the generator thread to unwind a cancelled job"""
+
+
+class GenerationJob:
+    """Runs a generation on a background thread and streams batched collapse events.
+
+    The generator never waits for the consumer: decided cells are buffered and posted
+    to events once batch_size cells piled up or batch_interval seconds went by.
+    With a RoomCache, a room generated before is posted as DONE without solving;
+    tile_data then makes the tileset part of the cache key.
+    """
+    def __init__(self, settings, rules=None, batch_size=512, batch_interval=0.03,
+                 cache=None, tile_data=None):
+        self.settings = settings
+        self.rules = rules
+        self.cache = cache
+        self.tile_data = tile_data
+        self.cache_hit = False
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.events = queue.Queue()
+        self._batch = []
+        self._last_flush = 0
+        self._cancelled = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def start(self):
+        self._last_flush = time.monotonic()
+        self._thread.start()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._running.set()
+
+    def _generate(self):
+        if self.cache is None:
+            return self._solve()
+        key = room_key(self.settings, self.rules, self.tile_data)
+        grid = self.cache.get(key)
+        if grid is not None:
+            self.cache_hit = True
+            return grid
+        grid = self._solve()
+        self.cache.put(key, grid)
+        return grid
+
+    def _solve(self):
+        return generate(self.settings, self.rules, on_collapse=self._on_collapse,
+                        on_restart=self._on_restart, on_chunk=self._on_chunk)
+
+    def _run(self):
+        try:
+            grid = self._generate()
+        except GenerationCancelled:
+            self.events.put((CANCELLED,))
+            return
+        except Exception as e:
+            self.events.put((FAILED, str(e)))
+            return
+        self._flush()
+        self.events.put((DONE, grid))
+
+    def _checkpoint(self):
+        if self._cancelled.is_set():
+            raise GenerationCancelled()
+        if not self._running.is_set():
+            self._flush()
+            self._running.wait()
+            if self._cancelled.is_set():
+                raise GenerationCancelled()
+
+    def _on_collapse(self, y, x, tile_id):
+        self._batch.append((y, x, tile_id))
+        if len(self._batch) >= self.batch_size or time.monotonic() - self._last_flush >= self.batch_interval:
+            self._flush()
+        self._checkpoint()
+
+    def _on_restart(self):
+        self._batch.clear()
+        self.events.put((RESET,))
+        self._checkpoint()
+
+    def _on_chunk(self, y, x, tiles):
+        self.events.put((CHUNK, y, x, tiles))
+        self._checkpoint()
+
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        if self._batch:
+            ys, xs, tile_ids = np.array(self._batch, dtype=np.int64).T
+            self._batch = []
+            self.events.put((BATCH, ys, xs, tile_ids))
+
+
+class BestOfJob(GenerationJob):
+    """Generates several candidates on a process pool and keeps the best ones.
+
+    The best grid is posted as DONE, candidates holds the kept ones best first.
+    """
+    def __init__(self, settings, rules, count, keep, threshold=None, properties=None,
+                 require_reachable=False):
+        super().__init__(settings, rules)
+        self.count = count
+        self.keep = keep
+        self.threshold = threshold
+        self.properties = properties
+        self.require_reachable = require_reachable
+        self.candidates = []
+
+    def _generate(self):
+        self.candidates = generate_best(self.settings, self.rules, self.count, self.keep,
+                                        self.threshold, self.properties, self.require_reachable,
+                                        on_candidate=lambda candidate: self._checkpoint())
+        if not self.candidates:
+            raise ValueError("None of the candidates could be generated")
+        return self.candidates[0].grid
@@ -0,0 +1,102 @@
+import numpy as np
+from PIL import Image
+from .tileset import image_to_array
+
+MAX_COLORS = 256
+
+# Odd 32-bit multipliers tried in turn to hash palette colors into a 4096 slot table
+HASH_MULTIPLIERS = tuple(np.uint32(value) for value in
+                         (0x9E3779B1, 0x85EBCA77, 0xC2B2AE3D, 0x27D4EB2F, 0x165667B1))
+HASH_SHIFT = np.uint32(20)
+
+
+def pack_colors(pixels):
+    """Views (..., 4) RGBA bytes as one uint32 word per pixel"""
+    return np.ascontiguousarray(pixels, dtype=np.uint8).view(np.uint32)[..., 0]
+
+
+def unpack_colors(words):
+    return np.ascontiguousarray(words, dtype=np.uint32)[..., None].view(np.uint8)
+
+
+def is_indexed(image):
+    """True for palette images whose palette carries the alpha of every entry"""
+    return image.mode == "P" and "transparency" not in image.info
+
+
+def image_palette(image):
+    """Returns the (colors, 4) RGBA palette of an indexed image"""
+    return np.array(image.getpalette("RGBA"), dtype=np.uint8).reshape(-1, 4)
+
+
+def remap_colors(pixels, palette):
+    """Maps every RGBA pixel to the index of its color in the palette.
+
+    Raises ValueError when some pixel has a color the palette does not hold.
+    """
+    words = pack_colors(pixels)
+    keys = pack_colors(palette)
+    table, multiplier = _color_table(keys)
+    if table is not None:
+        with np.errstate(over="ignore"):
+            indices = table[(words * multiplier) >> HASH_SHIFT]
+    else:
+        order = np.argsort(keys)
+        positions = np.searchsorted(keys[order], words)
+        indices = order[np.minimum(positions, len(keys) - 1)]
+    if (keys[indices] != words).any():
+        raise ValueError("Some colors are not in the palette")
+    return indices.astype(np.uint8)
+
+
+def _color_table(keys):
+    """Finds a multiplicative hash that sends every palette color to its own slot of a
+    4096 entry table, so pixels map with one multiply and one lookup. Returns
+    (table, multiplier), or (None, None) when none of the multipliers is collision free.
+    """
+    for multiplier in HASH_MULTIPLIERS:
+        with np.errstate(over="ignore"):
+            slots = (keys * multiplier) >> HASH_SHIFT
+        if len(np.unique(slots)) == len(keys):
+            table = np.zeros(1 << (32 - int(HASH_SHIFT)), dtype=np.intp)
+            table[slots] = np.arange(len(keys))
+            return table, multiplier
+    return None, None
+
+
+def to_indexed_image(image, max_colors=MAX_COLORS):
+    """Converts an image to a palette image with exact colors, alpha included.
+    Returns None when it has more than max_colors colors.
+    """
+    if is_indexed(image):
+        return image
+    rgba = image if image.mode == "RGBA" else image.convert("RGBA")
+    colors = rgba.getcolors(max_colors)
+    if colors is None:
+        return None
+    palette = np.array([color for _, color in colors], dtype=np.uint8).reshape(-1, 4)
+    return indexed_image(remap_colors(np.asarray(rgba), palette), palette)
+
+
+def indexed_image(indices, palette):
+    image = Image.fromarray(np.ascontiguousarray(indices, dtype=np.uint8), "P")
+    image.putpalette(np.ascontiguousarray(palette, dtype=np.uint8).tobytes(), "RGBA")
+    return image
+
+
+def reindex_image(image, palette):
+    """Converts an image to indices of an existing palette, or None if it needs new colors"""
+    rgba = image if image.mode == "RGBA" else image.convert("RGBA")
+    try:
+        return indexed_image(remap_colors(np.asarray(rgba), palette), palette)
+    except ValueError:
+        return None
+
+
+def sheet_array(image):
+    """The array tiles are sliced, hashed and compared from: (height, width, 1) palette
+    indices for indexed images, a quarter of the bytes, and RGBA pixels otherwise
+    """
+    if is_indexed(image):
+        return np.asarray(image, dtype=np.uint8)[..., None]
+    return image_to_array(image)
@@ -0,0 +1,104 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from .wfc import AdjacencyRules, OFFSETS
+
+# The compatibility table is dense, samples with more patterns than this are too noisy to learn from
+MAX_PATTERNS = 4096
+
+# Odd 64-bit multiplier for the polynomial pattern hash, arithmetic wraps around on purpose
+HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+class PatternSet:
+    """Unique NxN patterns of a sample with their frequencies and overlap compatibility.
+
+    compatible[d, a, b] is True when pattern b, shifted one cell in direction d from
+    pattern a, agrees with it on every overlapping cell.
+    """
+    def __init__(self, size, patterns, frequencies, hashes, compatible):
+        self.size = size
+        self.patterns = patterns
+        self.frequencies = frequencies
+        self.hashes = hashes
+        self.compatible = compatible
+        self.index = {int(value): position for position, value in enumerate(hashes)}
+
+    @property
+    def count(self):
+        return len(self.patterns)
+
+    def to_rules(self):
+        """Rules for the overlapping model: each pattern stands for its top-left tile"""
+        return AdjacencyRules(self.patterns[:, 0, 0], self.compatible, self.frequencies)
+
+
+def hash_patterns(flat):
+    """Hashes every row of a 2D integer array into a uint64, vectorized over rows"""
+    values = flat.astype(np.uint64)
+    hashes = np.zeros(len(flat), dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for column in range(flat.shape[1]):
+            hashes = (hashes ^ values[:, column]) * HASH_MULTIPLIER
+    return hashes
+
+
+def sample_windows(sample, size, periodic=False):
+    """Returns every NxN window of the sample as a (windows, N, N) array"""
+    if periodic:
+        sample = np.pad(sample, ((0, size - 1), (0, size - 1)), mode="wrap")
+    windows = sliding_window_view(sample, (size, size))
+    return windows.reshape(-1, size, size)
+
+
+def symmetries(windows, rotations=False, reflections=False):
+    variants = [windows]
+    if rotations:
+        variants += [np.rot90(windows, turns, axes=(1, 2)) for turns in (1, 2, 3)]
+    if reflections:
+        variants += [variant[:, :, ::-1] for variant in variants]
+    return np.concatenate(variants)
+
+
+def deduplicate(windows):
+    """Collapses identical windows through their hashes, returning (patterns, frequencies, hashes)"""
+    size = windows.shape[1]
+    flat = np.ascontiguousarray(windows).reshape(len(windows), -1)
+    hashes = hash_patterns(flat)
+    unique_hashes, first, frequencies = np.unique(hashes, return_index=True, return_counts=True)
+    patterns = flat[first]
+
+    # A 64-bit collision would merge two different patterns, fall back to exact rows if it happens
+    _, inverse = np.unique(hashes, return_inverse=True)
+    if not (flat == patterns[inverse.reshape(-1)]).all():
+        patterns, frequencies = np.unique(flat, axis=0, return_counts=True)
+        unique_hashes = hash_patterns(patterns)
+    return patterns.reshape(-1, size, size), frequencies, unique_hashes
+
+
+def overlap_compatibility(patterns):
+    """Builds the (4, P, P) table of patterns that agree when shifted by one cell"""
+    count = len(patterns)
+    compatible = np.zeros((4, count, count), dtype=bool)
+    for direction, (dy, dx) in enumerate(OFFSETS):
+        # The part of a that b covers after the shift, and the matching part of b
+        a_part = patterns[:, max(dy, 0):patterns.shape[1] + min(dy, 0),
+                          max(dx, 0):patterns.shape[2] + min(dx, 0)]
+        b_part = patterns[:, max(-dy, 0):patterns.shape[1] + min(-dy, 0),
+                          max(-dx, 0):patterns.shape[2] + min(-dx, 0)]
+        a_hash = hash_patterns(a_part.reshape(count, -1))
+        b_hash = hash_patterns(b_part.reshape(count, -1))
+        compatible[direction] = a_hash[:, None] == b_hash[None, :]
+    return compatible
+
+
+def extract_patterns(sample, size=3, rotations=False, reflections=False, periodic=False):
+    """Learns the patterns of a sample grid of tile ids for the overlapping model"""
+    sample = np.asarray(sample)
+    if min(sample.shape) < size and not periodic:
+        raise ValueError(f"The sample is smaller than the {size}x{size} pattern size")
+
+    windows = symmetries(sample_windows(sample, size, periodic), rotations, reflections)
+    patterns, frequencies, hashes = deduplicate(windows)
+    if len(patterns) > MAX_PATTERNS:
+        raise ValueError(f"The sample has {len(patterns)} distinct patterns, at most {MAX_PATTERNS} are supported")
+    return PatternSet(size, patterns, frequencies, hashes, overlap_compatibility(patterns))
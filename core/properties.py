@@ -0,0 +1,88 @@
+import numpy as np
+
+# Tile property flags, combined as a bitmask per tile
+SOLID = 1 << 0
+DOOR = 1 << 1
+PLATFORM = 1 << 2  # Solid from above only
+
+FLAG_NAMES = {SOLID: "Solid", DOOR: "Door", PLATFORM: "Platform"}
+
+
+class PropertyLayer:
+    """One property flag over a room, packed eight cells per byte along each row"""
+    def __init__(self, flag, width, height, bits):
+        self.flag = flag
+        self.width = width
+        self.height = height
+        self.bits = bits  # (height, ceil(width / 8)) uint8, most significant bit first
+
+    @classmethod
+    def from_mask(cls, flag, mask):
+        mask = np.asarray(mask, dtype=bool)
+        height, width = mask.shape
+        return cls(flag, width, height, np.packbits(mask, axis=1))
+
+    def to_mask(self):
+        return np.unpackbits(self.bits, axis=1, count=self.width).astype(bool)
+
+    def get(self, y, x):
+        return bool(self.bits[y, x >> 3] >> (7 - (x & 7)) & 1)
+
+    def count(self):
+        return int(np.unpackbits(self.bits, axis=1, count=self.width).sum())
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+
+class TileProperties:
+    """Property flags of tiles by global tile id, defined once per tileset"""
+    def __init__(self, flags=None):
+        self.flags = dict(flags or {})
+
+    def copy(self):
+        return TileProperties(self.flags)
+
+    def get(self, tile_id):
+        return self.flags.get(tile_id, 0)
+
+    def has(self, tile_id, flag):
+        return bool(self.get(tile_id) & flag)
+
+    def set_flag(self, tile_id, flag, enabled=True):
+        value = self.get(tile_id) | flag if enabled else self.get(tile_id) & ~flag
+        if value:
+            self.flags[tile_id] = value
+        else:
+            self.flags.pop(tile_id, None)
+
+    def tiles_with(self, flag):
+        return [tile_id for tile_id, value in self.flags.items() if value & flag]
+
+    def forget(self, tile_ids):
+        for tile_id in tile_ids:
+            self.flags.pop(tile_id, None)
+
+    def lookup_table(self, size):
+        """Returns a uint32 array mapping tile id to its flags for ids below size"""
+        table = np.zeros(size, dtype=np.uint32)
+        for tile_id, value in self.flags.items():
+            if tile_id < size:
+                table[tile_id] = value
+        return table
+
+    def layer(self, grid, flag):
+        """Returns a bool grid of the cells whose tile has the flag, empty cells excluded"""
+        grid = np.asarray(grid)
+        size = max(int(grid.max(initial=-1)) + 1, 1)
+        table = self.lookup_table(size)
+        return (table[np.maximum(grid, 0)] & flag).astype(bool) & (grid >= 0)
+
+    def room_layers(self, grid, flags=None):
+        """Derives the bit-packed layer of every flag, or of the given ones, for a room"""
+        grid = np.asarray(grid)
+        size = max(int(grid.max(initial=-1)) + 1, 1)
+        values = np.where(grid >= 0, self.lookup_table(size)[np.maximum(grid, 0)], 0)
+        return {flag: PropertyLayer.from_mask(flag, values & flag)
+                for flag in (flags or FLAG_NAMES)}
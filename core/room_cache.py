@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+import numpy as np
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def default_cache_dir():
+    """CEDURAL_CACHE_DIR if set, so CI runs can share and persist one cache"""
+    return os.environ.get("CEDURAL_CACHE_DIR") or os.path.join(
+        os.path.expanduser("~"), ".cache", "cedural", "rooms")
+
+
+def room_key(settings, rules=None, tile_data=None):
+    """Hashes everything a generated grid depends on into a cache key.
+
+    tile_data carries the tileset pixels and the tile geometry, rules the compiled
+    adjacency rules, and settings the room size, seed and mode options.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps(vars(settings), sort_keys=True).encode())
+    digest.update(b"tileset:" + (tile_data.digest().encode() if tile_data is not None else b""))
+    digest.update(b"rules:" + (rules.digest().encode() if rules is not None else b""))
+    return digest.hexdigest()
+
+
+class RoomCache:
+    """Generated grids stored on disk under their room_key, zlib compressed.
+
+    Once the files add up to more than max_bytes the least recently used ones are
+    evicted. File modification times carry the recency over to the next session.
+    """
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.total_bytes = 0
+        self._entries = OrderedDict()  # key -> file size, least recently used first
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._scan()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Returns the cached grid for key, or None on a miss"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                grid = decode_grid(file.read())
+            os.utime(path)
+        except (OSError, ValueError, zlib.error):
+            # Removed by another process or truncated, treat it as a miss
+            with self._lock:
+                self._forget(key)
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return grid
+
+    def put(self, key, grid):
+        data = encode_grid(grid)
+        path = self._path(key)
+        # Write beside the target then rename, so concurrent readers never see half a file
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, path)
+
+        with self._lock:
+            self._forget(key)
+            self._entries[key] = len(data)
+            self.total_bytes += len(data)
+            self._evict()
+
+    def get_or_generate(self, key, produce):
+        """Returns the cached grid for key, or calls produce() and caches its result"""
+        grid = self.get(key)
+        if grid is None:
+            grid = produce()
+            self.put(key, grid)
+        return grid
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._remove_file(key)
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def _scan(self):
+        found = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".room") and entry.is_file():
+                stat = entry.stat()
+                found.append((stat.st_mtime, entry.name[:-len(".room")], stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self.total_bytes += size
+        self._evict()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            self._remove_file(key)
+            self._forget(key)
+
+    def _forget(self, key):
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self.total_bytes -= size
+
+    def _remove_file(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.room")
+
+
+def encode_grid(grid):
+    """Packs a grid as its (height, width) header followed by zlib compressed int32 tiles"""
+    grid = np.asarray(grid)
+    header = np.array(grid.shape, dtype="<u4").tobytes()
+    return header + zlib.compress(np.ascontiguousarray(grid, dtype="<i4").tobytes())
+
+
+def decode_grid(data):
+    height, width = np.frombuffer(data[:8], dtype="<u4")
+    tiles = np.frombuffer(zlib.decompress(data[8:]), dtype="<i4")
+    return tiles.astype(np.int32).reshape(height, width)
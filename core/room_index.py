@@ -0,0 +1,166 @@
+import operator
+import re
+import numpy as np
+
+COMPARISONS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "=": operator.eq,
+}
+
+QUERY_PATTERN = re.compile(
+    r"^\s*(?:tiles?\s+)?(?P<terms>[^<>=]+?)\s*"
+    r"(?:(?P<op><=|>=|<|>|=)\s*(?P<value>\d+(?:\.\d+)?)\s*(?P<percent>%)?)?\s*$",
+    re.IGNORECASE
+)
+
+
+class _Postings:
+    """Growable (document, count) arrays of one tile"""
+    def __init__(self):
+        self.docs = np.empty(16, dtype=np.int32)
+        self.counts = np.empty(16, dtype=np.int32)
+        self.size = 0
+
+    def append(self, doc, count):
+        if self.size == len(self.docs):
+            self.docs = np.resize(self.docs, self.size * 2)
+            self.counts = np.resize(self.counts, self.size * 2)
+        self.docs[self.size] = doc
+        self.counts[self.size] = count
+        self.size += 1
+
+
+class RoomIndex:
+    """Inverted index from tile id to the rooms using it, with the count of each.
+
+    Every version of a room is appended as a document. Editing or removing a room
+    retires its document: queries skip retired documents, and their postings are
+    dropped once they make up half of the index.
+    """
+    def __init__(self):
+        self._postings = {}  # tile id -> _Postings
+        self._doc_of = {}  # room key -> current document
+        self._keys = []  # document -> room key
+        self._sizes = np.zeros(64, dtype=np.int64)  # cells of every document
+        self._alive = np.zeros(64, dtype=bool)
+        self._retired = 0
+
+    def __len__(self):
+        return len(self._doc_of)
+
+    def __contains__(self, key):
+        return key in self._doc_of
+
+    def add_room(self, key, grid):
+        """Indexes a room, replacing what was indexed for the same key before"""
+        self.remove_room(key)
+        grid = np.asarray(grid)
+        tile_ids, counts = np.unique(grid[grid >= 0], return_counts=True)
+
+        doc = len(self._keys)
+        if doc == len(self._alive):
+            self._sizes = np.resize(self._sizes, doc * 2)
+            self._alive = np.resize(self._alive, doc * 2)
+        self._keys.append(key)
+        self._sizes[doc] = grid.size
+        self._alive[doc] = True
+        self._doc_of[key] = doc
+        for tile_id, count in zip(tile_ids.tolist(), counts.tolist()):
+            postings = self._postings.get(tile_id)
+            if postings is None:
+                postings = self._postings[tile_id] = _Postings()
+            postings.append(doc, count)
+
+    update_room = add_room
+
+    def remove_room(self, key):
+        doc = self._doc_of.pop(key, None)
+        if doc is None:
+            return
+        self._alive[doc] = False
+        self._retired += 1
+        if self._retired > 1024 and self._retired * 2 > len(self._keys):
+            self._compact()
+
+    def clear(self):
+        self.__init__()
+
+    def totals(self, tile_ids):
+        """Returns the number of cells showing any of the tiles, by document"""
+        totals = np.zeros(len(self._keys), dtype=np.int64)
+        for tile_id in set(int(tile_id) for tile_id in tile_ids):
+            postings = self._postings.get(tile_id)
+            if postings is not None:
+                # A document appears at most once per tile, so plain fancy indexing adds up
+                totals[postings.docs[:postings.size]] += postings.counts[:postings.size]
+        return totals
+
+    def query(self, tile_ids, comparison=">", value=0, fraction=False):
+        """Keys of the rooms whose count of the tiles, or share of cells when fraction is
+        set, compares to value. The default finds every room using any of the tiles.
+        """
+        totals = self.totals(tile_ids)
+        if fraction:
+            sizes = self._sizes[:len(totals)]
+            totals = np.divide(totals, sizes, out=np.zeros(len(totals)), where=sizes > 0)
+        matches = COMPARISONS[comparison](totals, value) & self._alive[:len(totals)]
+        return [self._keys[doc] for doc in np.flatnonzero(matches)]
+
+    def search(self, text, groups=None):
+        """Runs a query typed as text, see parse_query"""
+        tile_ids, comparison, value, fraction = parse_query(text, groups)
+        return self.query(tile_ids, comparison, value, fraction)
+
+    def _compact(self):
+        live = np.flatnonzero(self._alive[:len(self._keys)])
+        renumber = np.full(len(self._keys), -1, dtype=np.int32)
+        renumber[live] = np.arange(len(live), dtype=np.int32)
+
+        for tile_id, postings in list(self._postings.items()):
+            docs = renumber[postings.docs[:postings.size]]
+            kept = docs >= 0
+            if not kept.any():
+                del self._postings[tile_id]
+                continue
+            postings.docs = docs[kept]
+            postings.counts = postings.counts[:postings.size][kept]
+            postings.size = len(postings.docs)
+
+        self._keys = [self._keys[doc] for doc in live]
+        self._doc_of = {key: doc for doc, key in enumerate(self._keys)}
+        capacity = max(64, len(live) * 2)
+        self._sizes = np.resize(self._sizes[live], capacity)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._alive[:len(live)] = True
+        self._retired = 0
+
+
+def parse_query(text, groups=None):
+    """Parses queries such as "312", "tile 312, 313" or "water > 20%".
+
+    Terms are tile ids or names from groups, a dict of lowercase name to tile ids.
+    Returns (tile_ids, comparison, value, fraction), where a percentage turns into a
+    fraction of the room's cells and a plain number into a count of cells.
+    """
+    match = QUERY_PATTERN.match(text)
+    if match is None:
+        raise ValueError(f"Could not read the query '{text}'")
+
+    tile_ids = []
+    for term in re.split(r"[\s,]+", match["terms"].strip()):
+        if term.isdigit():
+            tile_ids.append(int(term))
+        elif groups and term.lower() in groups:
+            tile_ids.extend(groups[term.lower()])
+        else:
+            raise ValueError(f"Unknown tile or group '{term}'")
+
+    if match["op"] is None:
+        return tile_ids, ">", 0, False
+    value = float(match["value"])
+    if match["percent"]:
+        return tile_ids, match["op"], value / 100, True
+    return tile_ids, match["op"], value, False
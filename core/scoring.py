@@ -0,0 +1,119 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from .connectivity import validate_room
+from .generator import generate, WORLD
+from .properties import TileProperties
+from .wfc import Contradiction
+
+
+class Candidate:
+    """One generated room with the metrics it was ranked by"""
+    def __init__(self, seed, grid, score, metrics):
+        self.seed = seed
+        self.grid = grid
+        self.score = score
+        self.metrics = metrics
+
+
+def tile_entropy(grid, tile_count=None):
+    """Shannon entropy of the tile distribution, normalized to 0..1"""
+    _, counts = np.unique(grid, return_counts=True)
+    probabilities = counts / counts.sum()
+    entropy = -(probabilities * np.log2(probabilities)).sum()
+    possible = max(tile_count or len(counts), 2)
+    return float(entropy / np.log2(possible))
+
+
+def room_metrics(grid, validation, tile_count=None):
+    """Computes the ranking metrics from a room and its reachability validation"""
+    return {
+        "walkable_ratio": float(validation.walkable.mean()),
+        "components": validation.components,
+        "reachable": validation.reachable,
+        "entropy": tile_entropy(grid, tile_count),
+    }
+
+
+def score_metrics(metrics):
+    """Favors open, varied rooms made of a single walkable region, in 0..1"""
+    return metrics["walkable_ratio"] * metrics["entropy"] / max(metrics["components"], 1)
+
+
+class CandidateStopped(Exception):
+    """Raised inside a worker once enough candidates have been found"""
+    pass
+
+
+_worker_rules = None
+_worker_stop = None
+
+
+def _init_worker(rules, stop):
+    global _worker_rules, _worker_stop
+    _worker_rules = rules
+    _worker_stop = stop
+
+
+def _check_stop(y, x, tile_id):
+    if _worker_stop.is_set():
+        raise CandidateStopped()
+
+
+def _generate_candidate(settings, properties, require_reachable):
+    if _worker_stop.is_set():
+        return None
+    grid = generate(settings, _worker_rules, on_collapse=_check_stop)
+    validation = validate_room(grid, properties)
+    if require_reachable and not validation.reachable:
+        return None
+    tile_count = _worker_rules.count if _worker_rules is not None else None
+    metrics = room_metrics(grid, validation, tile_count)
+    return Candidate(settings.seed, grid, score_metrics(metrics), metrics)
+
+
+def generate_best(settings, rules, count, keep=1, threshold=None, properties=None,
+                  require_reachable=False, workers=None, on_candidate=None):
+    """Generates count candidates with consecutive seeds on a process pool, best keep first.
+
+    Walkability comes from the SOLID flag of properties. With require_reachable, rooms
+    whose doors do not all connect are rejected, and so are rooms that end in a
+    contradiction. Once a candidate reaches threshold, queued candidates are dropped and
+    the ones still running give up at their next decided cell.
+    on_candidate(candidate) is called as each accepted one lands.
+    """
+    properties = properties or TileProperties()
+    if settings.mode == WORLD:
+        raise ValueError("World maps are already generated in parallel, pick another mode")
+
+    candidates = []
+    stop = multiprocessing.Event()
+    pool = ProcessPoolExecutor(workers or os.cpu_count(), initializer=_init_worker,
+                               initargs=(rules, stop))
+    try:
+        futures = []
+        for offset in range(count):
+            candidate_settings = settings.with_seed((settings.seed + offset) % 2 ** 31)
+            futures.append(pool.submit(_generate_candidate, candidate_settings, properties,
+                                       require_reachable))
+
+        for future in as_completed(futures):
+            try:
+                candidate = future.result()
+            except Contradiction:
+                # A contradiction only loses this candidate
+                continue
+            if candidate is None:
+                continue
+            candidates.append(candidate)
+            if on_candidate:
+                on_candidate(candidate)
+            if threshold is not None and candidate.score >= threshold:
+                break
+    finally:
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    candidates.sort(key=lambda candidate: candidate.score, reverse=True)
+    return candidates[:keep]
@@ -0,0 +1,184 @@
+"""Local generation server for game tools and level pipelines.
+
+Run from the project root with ``python -m core.server``. POST a JSON configuration
+to /generate and get the tile grid back as JSON, or as raw little-endian int32 with
+``"format": "binary"``. Tilesets, samples and compiled rules stay warm between requests,
+and generated rooms are kept in the on-disk RoomCache, whose counters GET /cache returns.
+"""
+import argparse
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from PIL import Image
+from .generator import GenerationSettings, generate, CAVE, WORLD
+from .patterns import extract_patterns
+from .room_cache import RoomCache, room_key
+from .tileset import image_to_array, compute_tile_data, match_tiles
+from .wfc import edge_rules, Contradiction
+
+SETTING_FIELDS = ("width", "height", "mode", "seed", "iterations", "fill_ratio",
+                  "wall_tile", "floor_tile", "chunk_size")
+
+
+def _generate_in_worker(settings, rules):
+    return generate(settings, rules)
+
+
+class GenerationService:
+    """The generation core shared by every request: warm rules plus a process pool"""
+    def __init__(self, workers=None, cache_size=16, room_cache=None):
+        self.pool = ProcessPoolExecutor(workers or os.cpu_count())
+        self.cache_size = cache_size
+        self.room_cache = room_cache
+        self._rules = OrderedDict()
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+    def rules_for(self, request):
+        """Compiles (rules, tile_data) for a request, or returns them from the cache"""
+        tileset = request.get("tileset")
+        if not tileset:
+            raise ValueError("'tileset' is required outside cave mode")
+        geometry = (int(request.get("tile_width", 32)), int(request.get("tile_height", 32)),
+                    int(request.get("spacing", 0)))
+        sample = request.get("sample")
+        key = (tileset, os.path.getmtime(tileset), geometry)
+        if sample:
+            key += (sample, os.path.getmtime(sample), int(request.get("pattern_size", 3)),
+                    bool(request.get("rotations", False)), bool(request.get("reflections", False)))
+
+        with self._lock:
+            compiled = self._rules.get(key)
+            if compiled is not None:
+                self._rules.move_to_end(key)
+                return compiled
+
+        tile_data = compute_tile_data(image_to_array(Image.open(tileset)), *geometry)
+        if sample:
+            sample_data = compute_tile_data(image_to_array(Image.open(sample)), *geometry[:2])
+            rules = extract_patterns(match_tiles(tile_data, sample_data), key[5],
+                                     rotations=key[6], reflections=key[7]).to_rules()
+        else:
+            rules = edge_rules(tile_data)
+
+        with self._lock:
+            self._rules[key] = rules, tile_data
+            while len(self._rules) > self.cache_size:
+                self._rules.popitem(last=False)
+        return rules, tile_data
+
+    def settings_for(self, request):
+        settings = GenerationSettings()
+        for field in SETTING_FIELDS:
+            if field in request:
+                setattr(settings, field, type(getattr(settings, field))(request[field]))
+        return settings.validate()
+
+    def generate(self, request):
+        settings = self.settings_for(request)
+        rules, tile_data = (None, None) if settings.mode == CAVE else self.rules_for(request)
+        if self.room_cache is None:
+            return settings, self._generate(settings, rules)
+        key = room_key(settings, rules, tile_data)
+        return settings, self.room_cache.get_or_generate(key, lambda: self._generate(settings, rules))
+
+    def _generate(self, settings, rules):
+        if settings.mode == WORLD:
+            # World maps run their own process pool
+            return generate(settings, rules)
+        return self.pool.submit(_generate_in_worker, settings, rules).result()
+
+
+class GenerationRequestHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def do_GET(self):
+        if self.path == "/health":
+            self.send_json(200, {"status": "ok"})
+        elif self.path == "/cache":
+            room_cache = self.service.room_cache
+            self.send_json(200, room_cache.stats() if room_cache else {"enabled": False})
+        else:
+            self.send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if self.path != "/generate":
+            self.send_json(404, {"error": "Not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            settings, grid = self.service.generate(request)
+        except (ValueError, KeyError, OSError) as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        except Contradiction as e:
+            self.send_json(422, {"error": str(e)})
+            return
+        except Exception as e:
+            self.send_json(500, {"error": str(e)})
+            return
+
+        if request.get("format") == "binary":
+            body = np.ascontiguousarray(grid, dtype="<i4").tobytes()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("X-Width", str(grid.shape[1]))
+            self.send_header("X-Height", str(grid.shape[0]))
+            self.send_header("X-Seed", str(settings.seed))
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_json(200, {"width": grid.shape[1], "height": grid.shape[0],
+                                 "seed": settings.seed, "tiles": grid.tolist()})
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(service, host="127.0.0.1", port=8765):
+    """Creates a threaded HTTP server bound to localhost by default"""
+    handler = type("BoundRequestHandler", (GenerationRequestHandler,), {"service": service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cedural local generation server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--cache-dir", default=None, help="Where generated rooms are cached")
+    parser.add_argument("--cache-mb", type=int, default=256, help="Room cache size limit")
+    parser.add_argument("--no-cache", action="store_true", help="Always generate")
+    args = parser.parse_args(argv)
+
+    room_cache = None if args.no_cache else RoomCache(args.cache_dir, args.cache_mb * 1024 * 1024)
+    service = GenerationService(args.workers, room_cache=room_cache)
+    server = make_server(service, args.host, args.port)
+    print(f"Cedural generation server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+import numpy as np
+from .wfc import Contradiction
+from .world import chunk_seed, place_chunk
+
+
+class ChunkCache:
+    """Keeps the most recently used chunks in memory and spills the rest to disk"""
+    def __init__(self, chunk_size, max_chunks=256, cache_dir=None):
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self._owns_dir = cache_dir is None
+        self.cache_dir = cache_dir or tempfile.mkdtemp(prefix="cedural-chunks-")
+        self._memory = OrderedDict()
+        self._on_disk = set()
+
+    def __contains__(self, key):
+        return key in self._memory or key in self._on_disk
+
+    def get(self, key):
+        tiles = self._memory.get(key)
+        if tiles is not None:
+            self._memory.move_to_end(key)
+            return tiles
+        if key not in self._on_disk:
+            return None
+
+        with open(self._path(key), "rb") as file:
+            data = zlib.decompress(file.read())
+        tiles = np.frombuffer(data, dtype=np.int32).reshape(self.chunk_size, self.chunk_size)
+        self._remember(key, tiles)
+        return tiles
+
+    def put(self, key, tiles):
+        # A copy spilled earlier is out of date now, write it again on eviction
+        self._on_disk.discard(key)
+        self._remember(key, np.asarray(tiles, dtype=np.int32))
+
+    def close(self):
+        self._memory.clear()
+        self._on_disk.clear()
+        if self._owns_dir:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def _remember(self, key, tiles):
+        self._memory[key] = tiles
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_chunks:
+            old_key, old_tiles = self._memory.popitem(last=False)
+            if old_key not in self._on_disk:
+                with open(self._path(old_key), "wb") as file:
+                    file.write(zlib.compress(old_tiles.tobytes()))
+                self._on_disk.add(old_key)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key[0]}_{key[1]}.chunk")
+
+
+class StreamStopped(Exception):
+    """Raised inside a chunk source once its streamer has been stopped"""
+    pass
+
+
+class WfcChunkSource:
+    """Solves chunks against whichever neighbors already exist, rewriting them when the
+    chunk cannot fit between them as they are, the way core.world does
+    """
+    def __init__(self, rules, seed, chunk_size):
+        self.rules = rules
+        self.seed = seed
+        self.chunk_size = chunk_size
+
+    def __call__(self, key, area, stopped=None):
+        """Solves the chunk in the middle of area in place, see place_chunk, and returns
+        the bounds that changed. Once the stopped event is set, the solve is abandoned at
+        the next decided cell with StreamStopped.
+        """
+        def check_stopped(y, x, tile_id):
+            if stopped.is_set():
+                raise StreamStopped()
+
+        size = self.chunk_size
+        return place_chunk(area, size + 1, size + 1, size, size, self.rules,
+                           chunk_seed(self.seed, *key),
+                           on_collapse=check_stopped if stopped is not None else None)
+
+
+class ChunkStreamer:
+    """Produces chunks on a background thread, nearest requested chunk first.
+
+    Finished chunks are posted to results as (key, tiles) for the caller to drain, and
+    posted again whenever a later chunk rewrites part of them.
+
+    The source is called as source(key, area, stopped). area is the square of three
+    chunks plus a one cell ring around the requested chunk, holding the tiles of every
+    existing chunk and -1 elsewhere. The source solves the chunk in the middle in place and
+    returns the (top, left, bottom, right) bounds it changed, or raises Contradiction.
+    stopped is an Event it may poll to give up early by raising StreamStopped.
+    """
+    def __init__(self, chunk_size, source, max_chunks=256, cache_dir=None):
+        self.chunk_size = chunk_size
+        self.source = source
+        self.cache = ChunkCache(chunk_size, max_chunks, cache_dir)
+        self.results = queue.Queue()
+        self._wanted = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """Stops producing chunks without waiting for the one in progress; the thread
+        drops it and removes the cache on its way out
+        """
+        self._stopped.set()
+        self._wake.set()
+        if not self._thread.is_alive():
+            self.cache.close()
+
+    def request(self, keys):
+        """Replaces the pending requests, given in priority order"""
+        with self._lock:
+            self._wanted = list(keys)
+        self._wake.set()
+
+    def _next_key(self):
+        with self._lock:
+            if self._wanted:
+                return self._wanted.pop(0)
+            self._wake.clear()
+            return None
+
+    def _run(self):
+        try:
+            while not self._stopped.is_set():
+                key = self._next_key()
+                if key is None:
+                    self._wake.wait()
+                    continue
+                tiles = self.cache.get(key)
+                if tiles is not None:
+                    self.results.put((key, tiles))
+                    continue
+                area = self._neighborhood(key)
+                try:
+                    bounds = self.source(key, area, self._stopped)
+                except Contradiction:
+                    # Left out of the cache, so the chunk is tried again when next requested
+                    continue
+                for changed_key, tiles in self._changed_chunks(key, area, bounds):
+                    self.cache.put(changed_key, tiles)
+                    self.results.put((changed_key, tiles))
+        except StreamStopped:
+            pass
+        finally:
+            self.cache.close()
+
+    def _neighborhood(self, key):
+        """Lays out the existing chunks around a chunk as the area its source solves in:
+        the eight neighbors whole, plus the ring of tiles beyond them
+        """
+        size = self.chunk_size
+        extent = 3 * size + 2
+        area = np.full((extent, extent), -1, dtype=np.int32)
+        row, col = key
+        for dy in range(-2, 3):
+            for dx in range(-2, 3):
+                neighbor = (row + dy, col + dx)
+                if (dy, dx) == (0, 0) or neighbor not in self.cache:
+                    continue
+                # The neighbor's place in the area, clipped to the ring for the outer ones
+                y, x = (dy + 1) * size + 1, (dx + 1) * size + 1
+                top, left = max(y, 0), max(x, 0)
+                bottom, right = min(y + size, extent), min(x + size, extent)
+                area[top:bottom, left:right] = self.cache.get(neighbor)[top - y:bottom - y,
+                                                                        left - x:right - x]
+        return area
+
+    def _changed_chunks(self, key, area, bounds):
+        """Yields (key, tiles) for the chunk and every existing neighbor within bounds"""
+        size = self.chunk_size
+        top, left, bottom, right = bounds
+        row, col = key
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                neighbor = (row + dy, col + dx)
+                y, x = (dy + 1) * size + 1, (dx + 1) * size + 1
+                overlaps = y < bottom and top < y + size and x < right and left < x + size
+                if neighbor == key or (overlaps and neighbor in self.cache):
+                    yield neighbor, area[y:y + size, x:x + size].copy()
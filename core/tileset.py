@@ -0,0 +1,118 @@
+import hashlib
+import numpy as np
+
+
+def image_to_array(image):
+    """Converts a PIL image to an RGBA uint8 array of shape (height, width, 4)"""
+    if image.mode != "RGBA":
+        image = image.convert("RGBA")
+    return np.asarray(image, dtype=np.uint8)
+
+
+def grid_shape(pixel_width, pixel_height, tile_width, tile_height, spacing):
+    """Returns (rows, cols) of complete tiles that fit in the given pixel size"""
+    cols = pixel_width // (tile_width + spacing)
+    rows = pixel_height // (tile_height + spacing)
+    return rows, cols
+
+
+def slice_tiles(pixels, tile_width, tile_height, spacing=0):
+    """Slices a sheet array into a (rows, cols, tile_height, tile_width, 4) view"""
+    rows, cols = grid_shape(pixels.shape[1], pixels.shape[0], tile_width, tile_height, spacing)
+    step_x = tile_width + spacing
+    step_y = tile_height + spacing
+    cropped = pixels[:rows * step_y, :cols * step_x]
+    cells = cropped.reshape(rows, step_y, cols, step_x, pixels.shape[2])
+    return cells[:, :tile_height, :, :tile_width].transpose(0, 2, 1, 3, 4)
+
+
+def tiles_to_block(tiles):
+    """Lays out sliced tiles edge to edge, dropping the sheet spacing"""
+    rows, cols, tile_height, tile_width, channels = tiles.shape
+    return tiles.transpose(0, 2, 1, 3, 4).reshape(rows * tile_height, cols * tile_width, channels)
+
+
+class TileData:
+    """Per-tile hashes and edge hashes of a sliced sheet, indexed row-major"""
+    def __init__(self, tile_width, tile_height, spacing, rows, cols, hashes, edge_hashes):
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.spacing = spacing
+        self.rows = rows
+        self.cols = cols
+        self.hashes = hashes
+        self.edge_hashes = edge_hashes  # (tiles, 4) as top, right, bottom, left
+
+    def matches_geometry(self, tile_width, tile_height, spacing):
+        return (self.tile_width, self.tile_height, self.spacing) == (tile_width, tile_height, spacing)
+
+    def digest(self):
+        """Content hash of the sliced pixels and the geometry that sliced them"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(np.array([self.tile_width, self.tile_height, self.spacing,
+                                self.rows, self.cols], dtype="<i8").tobytes())
+        digest.update(np.ascontiguousarray(self.hashes, dtype="<u8").tobytes())
+        return digest.hexdigest()
+
+
+def hash_rows(data):
+    """Hashes every row of a 2D uint8 array into a uint64"""
+    data = np.ascontiguousarray(data)
+    return np.fromiter((int.from_bytes(hashlib.blake2b(row, digest_size=8).digest(), "little")
+                        for row in data), dtype=np.uint64, count=len(data))
+
+
+def hash_tiles(flat):
+    """Hashes a (tiles, height, width, channels) stack, returning (hashes, edge_hashes)"""
+    hashes = hash_rows(flat.reshape(len(flat), -1))
+    edges = [flat[:, 0], flat[:, :, -1], flat[:, -1], flat[:, :, 0]]
+    edge_hashes = np.stack([hash_rows(edge.reshape(len(flat), -1)) for edge in edges], axis=1)
+    return hashes, edge_hashes.reshape(len(flat), 4)
+
+
+def compute_tile_data(pixels, tile_width, tile_height, spacing=0):
+    """Hashes every tile and its four edges so tiles can be compared without pixels"""
+    tiles = slice_tiles(pixels, tile_width, tile_height, spacing)
+    rows, cols = tiles.shape[:2]
+    flat = tiles.reshape(rows * cols, tile_height, tile_width, tiles.shape[-1])
+    hashes, edge_hashes = hash_tiles(flat)
+    return TileData(tile_width, tile_height, spacing, rows, cols, hashes, edge_hashes)
+
+
+def changed_tiles(old_pixels, new_pixels, tile_width, tile_height, spacing=0):
+    """Returns the row-major indices of the tiles whose pixels differ between two
+    decodes of a sheet, or None when the sheet no longer slices into the same grid
+    """
+    old_tiles = slice_tiles(old_pixels, tile_width, tile_height, spacing)
+    new_tiles = slice_tiles(new_pixels, tile_width, tile_height, spacing)
+    if old_tiles.shape != new_tiles.shape:
+        return None
+    if old_pixels.shape[-1] == 4:
+        # Compare 4-byte pixels as single words rather than channel by channel
+        differs = old_pixels.view(np.uint32)[..., 0] != new_pixels.view(np.uint32)[..., 0]
+    else:
+        differs = (old_pixels != new_pixels).any(axis=-1)
+    cells = slice_tiles(differs[..., None], tile_width, tile_height, spacing)
+    return np.flatnonzero(cells.any(axis=(2, 3, 4)))
+
+
+def update_tile_data(tile_data, pixels, indices):
+    """Returns tile data with only the given tiles re-hashed from the new pixels"""
+    tiles = slice_tiles(pixels, tile_data.tile_width, tile_data.tile_height, tile_data.spacing)
+    rows, cols = np.divmod(indices, tile_data.cols)
+    hashes = tile_data.hashes.copy()
+    edge_hashes = tile_data.edge_hashes.copy()
+    hashes[indices], edge_hashes[indices] = hash_tiles(tiles[rows, cols])
+    return TileData(tile_data.tile_width, tile_data.tile_height, tile_data.spacing,
+                    tile_data.rows, tile_data.cols, hashes, edge_hashes)
+
+
+def match_tiles(tile_data, sample_data):
+    """Finds the sheet index of every sample tile by hash, as a (rows, cols) grid"""
+    order = np.argsort(tile_data.hashes)
+    positions = np.searchsorted(tile_data.hashes, sample_data.hashes, sorter=order)
+    matched = order[np.minimum(positions, len(order) - 1)]
+    found = tile_data.hashes[matched] == sample_data.hashes
+    if not found.all():
+        raise ValueError(f"{np.count_nonzero(~found)} tiles of the sample are not in the tileset")
+    return matched.reshape(sample_data.rows, sample_data.cols)
@@ -0,0 +1,161 @@
+import hashlib
+import numpy as np
+
+# Neighbor offsets as (dy, dx), in the same order as the edge hashes: top, right, bottom, left
+UP, RIGHT, DOWN, LEFT = range(4)
+OFFSETS = ((-1, 0), (0, 1), (1, 0), (0, -1))
+OPPOSITE = (DOWN, LEFT, UP, RIGHT)
+
+
+class Contradiction(Exception):
+    """Raised when a cell is left without any tile that satisfies its neighbors"""
+
+
+class AdjacencyRules:
+    """Which tiles may sit next to each other.
+
+    allowed[d, a, b] is True when tile b may be placed in direction d of tile a.
+    Tiles are addressed by local index; tile_ids maps them back to global atlas ids.
+    Several local entries may share a tile id, as learned patterns do.
+    """
+    def __init__(self, tile_ids, allowed, weights=None):
+        self.tile_ids = np.asarray(tile_ids, dtype=np.int32)
+        self.allowed = np.asarray(allowed, dtype=bool)
+        if weights is None:
+            weights = np.ones(len(self.tile_ids))
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self._digest = None
+
+    @property
+    def count(self):
+        return len(self.tile_ids)
+
+    @classmethod
+    def unconstrained(cls, tile_ids):
+        count = len(tile_ids)
+        return cls(tile_ids, np.ones((4, count, count), dtype=bool))
+
+    @classmethod
+    def from_edge_hashes(cls, tile_ids, edge_hashes):
+        """Allows two tiles to touch when the pixels of their facing edges are identical"""
+        top, right, bottom, left = edge_hashes.T
+        allowed = np.stack([
+            top[:, None] == bottom[None, :],
+            right[:, None] == left[None, :],
+            bottom[:, None] == top[None, :],
+            left[:, None] == right[None, :],
+        ])
+        return cls(tile_ids, allowed)
+
+    def digest(self):
+        """Content hash of the compiled rules, computed once"""
+        if self._digest is None:
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(self.tile_ids.astype("<i4").tobytes())
+            digest.update(np.packbits(self.allowed).tobytes())
+            digest.update(self.weights.astype("<f8").tobytes())
+            self._digest = digest.hexdigest()
+        return self._digest
+
+    def options_for(self, tile_ids):
+        """Returns a (len(tile_ids), count) mask of the local entries showing each global id"""
+        return np.ravel(tile_ids)[:, None] == self.tile_ids[None, :]
+
+    def pruned(self):
+        """Drops tiles that cannot have a neighbor in some direction, until none are left to drop"""
+        keep = np.ones(self.count, dtype=bool)
+        while True:
+            sub = self.allowed[:, keep][:, :, keep]
+            usable = sub.any(axis=2).all(axis=0)
+            if usable.all():
+                break
+            keep[np.flatnonzero(keep)[~usable]] = False
+        return AdjacencyRules(self.tile_ids[keep], self.allowed[:, keep][:, :, keep],
+                              self.weights[keep])
+
+
+def edge_rules(tile_data, first_id=0):
+    """Compiles the edge-matching rules of a sliced sheet, dropping tiles that fit nowhere"""
+    tile_ids = np.arange(first_id, first_id + len(tile_data.hashes))
+    return AdjacencyRules.from_edge_hashes(tile_ids, tile_data.edge_hashes).pruned()
+
+
+def solve(width, height, rules, seed=None, fixed=None, on_collapse=None, on_restart=None,
+          attempts=10):
+    """Fills a (height, width) grid with global tile ids satisfying the rules.
+
+    fixed is an optional grid of global ids (-1 for free cells) that are kept as-is
+    and constrain their neighbors. on_collapse(y, x, tile_id) is called every time a
+    cell is decided, either by choice or by propagation, and on_restart() before an
+    attempt that starts over after a contradiction.
+    """
+    if rules.count == 0:
+        raise Contradiction("The rules do not contain any tile")
+
+    rng = np.random.default_rng(seed)
+    for attempt in range(attempts):
+        if attempt and on_restart:
+            on_restart()
+        try:
+            return _solve_once(width, height, rules, rng, fixed, on_collapse)
+        except Contradiction:
+            continue
+    raise Contradiction(f"No solution found after {attempts} attempts")
+
+
+def _solve_once(width, height, rules, rng, fixed, on_collapse):
+    possible = np.ones((height, width, rules.count), dtype=bool)
+    counts = np.full((height, width), rules.count, dtype=np.int64)
+    # Small noise breaks ties between cells with the same number of options
+    noise = rng.random((height, width)) * 0.5
+    stack = []
+
+    if fixed is not None:
+        ys, xs = np.nonzero(fixed >= 0)
+        possible[ys, xs] = rules.options_for(fixed[ys, xs])
+        counts[ys, xs] = possible[ys, xs].sum(axis=1)
+        if not counts[ys, xs].all():
+            raise Contradiction("A fixed tile is not part of the rules")
+        stack.extend(zip(ys.tolist(), xs.tolist()))
+        _propagate(possible, counts, rules, stack, on_collapse)
+
+    while True:
+        entropy = np.where(counts > 1, counts + noise, np.inf)
+        cell = int(np.argmin(entropy))
+        y, x = divmod(cell, width)
+        if counts[y, x] <= 1:
+            break
+
+        options = np.flatnonzero(possible[y, x])
+        weights = rules.weights[options]
+        choice = rng.choice(options, p=weights / weights.sum())
+        possible[y, x] = False
+        possible[y, x, choice] = True
+        counts[y, x] = 1
+        if on_collapse:
+            on_collapse(y, x, int(rules.tile_ids[choice]))
+        _propagate(possible, counts, rules, [(y, x)], on_collapse)
+
+    return rules.tile_ids[possible.argmax(axis=2)]
+
+
+def _propagate(possible, counts, rules, stack, on_collapse):
+    height, width = counts.shape
+    while stack:
+        y, x = stack.pop()
+        cell = possible[y, x]
+        for direction, (dy, dx) in enumerate(OFFSETS):
+            ny, nx = y + dy, x + dx
+            if not (0 <= ny < height and 0 <= nx < width):
+                continue
+            reduced = possible[ny, nx] & (cell @ rules.allowed[direction])
+            remaining = np.count_nonzero(reduced)
+            if remaining == counts[ny, nx]:
+                continue
+            if remaining == 0:
+                raise Contradiction(f"Cell ({ny}, {nx}) has no valid tile left")
+            possible[ny, nx] = reduced
+            counts[ny, nx] = remaining
+            if remaining == 1 and on_collapse:
+                on_collapse(ny, nx, int(rules.tile_ids[reduced.argmax()]))
+            stack.append((ny, nx))
@@ -0,0 +1,131 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from .wfc import solve, Contradiction
+
+# Chunks are solved in waves along the anti-diagonals, chunk row + chunk column. Chunks of
+# a wave never touch, so they run in parallel, and the only placed tiles around a chunk are
+# those of its neighbors above and to the left. Those were both solved outward from the same
+# corner, so they agree with each other; a chunk squeezed between two neighbors solved
+# independently can be left without any valid tile. A chunk that still contradicts is
+# solved again with room to rewrite its neighbors, see solve_chunk.
+
+_worker_rules = None
+
+
+def _init_worker(rules):
+    global _worker_rules
+    _worker_rules = rules
+
+
+def _solve_chunk(area, y, x, height, width, seed):
+    solve_chunk(area, y, x, height, width, _worker_rules, seed)
+    return area[y:y + height, x:x + width]
+
+
+def chunk_seed(seed, chunk_row, chunk_col):
+    """Derives an independent, reproducible seed for one chunk, negative coordinates included"""
+    entropy = [seed, chunk_row & 0xFFFFFFFF, chunk_col & 0xFFFFFFFF]
+    return np.random.SeedSequence(entropy).generate_state(1)[0]
+
+
+def chunk_bounds(width, height, chunk_size):
+    """Yields (chunk_row, chunk_col, y, x, chunk_height, chunk_width) covering the world"""
+    for chunk_row, y in enumerate(range(0, height, chunk_size)):
+        for chunk_col, x in enumerate(range(0, width, chunk_size)):
+            yield chunk_row, chunk_col, y, x, min(chunk_size, height - y), min(chunk_size, width - x)
+
+
+def solve_chunk(area, y, x, height, width, rules, seed, margin=0, on_collapse=None):
+    """Solves the chunk at (y, x) of area, a grid of placed tiles with -1 for free cells,
+    writing it into area in place.
+
+    The placed tiles up to margin cells around the chunk are solved again with it, and
+    the one cell ring of placed tiles beyond them stays fixed, so every seam with the rest
+    of area satisfies the rules. Free cells outside the chunk are left free. Returns the
+    (top, left, bottom, right) bounds that may have changed, and raises Contradiction
+    when no solution is found.
+    """
+    area_height, area_width = area.shape
+    inner_top, inner_left = max(y - margin, 0), max(x - margin, 0)
+    inner_bottom = min(y + height + margin, area_height)
+    inner_right = min(x + width + margin, area_width)
+    top, left = max(inner_top - 1, 0), max(inner_left - 1, 0)
+    bottom, right = min(inner_bottom + 1, area_height), min(inner_right + 1, area_width)
+
+    region = area[top:bottom, left:right]
+    fixed = region.copy()
+    fixed[inner_top - top:inner_bottom - top, inner_left - left:inner_right - left] = -1
+    tiles = solve(right - left, bottom - top, rules, seed=seed, fixed=fixed,
+                  on_collapse=on_collapse)
+
+    keep = region >= 0
+    keep[y - top:y - top + height, x - left:x - left + width] = True
+    region[keep] = tiles[keep]
+    return inner_top, inner_left, inner_bottom, inner_right
+
+
+def place_chunk(area, y, x, height, width, rules, seed, on_collapse=None):
+    """Solves a chunk against the placed tiles around it and, if that contradicts, again
+    with room to rewrite the placed tiles up to one chunk away. Returns the changed bounds.
+    """
+    try:
+        return solve_chunk(area, y, x, height, width, rules, seed, on_collapse=on_collapse)
+    except Contradiction:
+        return solve_chunk(area, y, x, height, width, rules, seed, max(height, width),
+                           on_collapse)
+
+
+def generate_world(width, height, rules, seed, chunk_size=64, workers=None, on_chunk=None):
+    """Generates a large map chunk by chunk across a process pool.
+
+    on_chunk(y, x, tiles) is called in the calling process as each chunk lands, and again
+    for the area around a chunk that had to rewrite its neighbors.
+    """
+    world = np.full((height, width), -1, dtype=np.int32)
+    chunks = list(chunk_bounds(width, height, chunk_size))
+    waves = max(chunk_row + chunk_col for chunk_row, chunk_col, *_ in chunks) + 1
+
+    pool = ProcessPoolExecutor(workers or os.cpu_count(), initializer=_init_worker,
+                               initargs=(rules,))
+    try:
+        for wave in range(waves):
+            futures = {}
+            for chunk in chunks:
+                chunk_row, chunk_col, y, x, chunk_height, chunk_width = chunk
+                if chunk_row + chunk_col != wave:
+                    continue
+                # Workers only need the chunk and the ring of placed tiles around it
+                top, left = max(y - 1, 0), max(x - 1, 0)
+                bottom, right = min(y + chunk_height + 1, height), min(x + chunk_width + 1, width)
+                future = pool.submit(_solve_chunk, world[top:bottom, left:right].copy(),
+                                     y - top, x - left, chunk_height, chunk_width,
+                                     chunk_seed(seed, chunk_row, chunk_col))
+                futures[future] = chunk
+
+            failed = []
+            for future in as_completed(futures):
+                chunk_row, chunk_col, y, x, chunk_height, chunk_width = chunk = futures[future]
+                try:
+                    tiles = future.result()
+                except Contradiction:
+                    failed.append(chunk)
+                    continue
+                world[y:y + chunk_height, x:x + chunk_width] = tiles
+                if on_chunk:
+                    on_chunk(y, x, tiles)
+
+            # Rare, and rewriting neighbors can touch chunks of this wave, so one at a time
+            for chunk_row, chunk_col, y, x, chunk_height, chunk_width in failed:
+                top, left, bottom, right = solve_chunk(
+                    world, y, x, chunk_height, chunk_width, rules,
+                    chunk_seed(seed, chunk_row, chunk_col), chunk_size)
+                if on_chunk:
+                    on_chunk(top, left, world[top:bottom, left:right])
+    except BaseException:
+        # A failed chunk or an on_chunk that aborts should not wait for the rest of the wave
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+
+    return world
@@ -1,5 +1,16 @@
-from PySide6.QtWidgets import QMainWindow, QHBoxLayout, QWidget, QSplitter, QVBoxLayout, QSizePolicy
-from PySide6.QtCore import Qt
+from PySide6.QtWidgets import (QMainWindow, QHBoxLayout, QWidget, QSplitter, QVBoxLayout, QSizePolicy,
+                               QFileDialog)
+from PySide6.QtCore import Qt, QTimer
+from core.generator import CAVE, WORLD
+from core.job import GenerationJob, BestOfJob, DONE
+from core.properties import SOLID, FLAG_NAMES
+from core.streaming import ChunkStreamer, WfcChunkSource
+from core.patterns import extract_patterns
+from core.room_cache import RoomCache
+from core.collision import write_collision
+from PIL import Image
+import os
+import numpy as np
 from .panels.tileset_panel import TilesetPanel
 from .panels.preview_panel import PreviewPanel
 from .panels.settings_panel import SettingsPanel
@@ -10,7 +21,14 @@ from .panels.workspace_panel import WorkspacePanel
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
+        self.learned_rules = None
+        self.generation_job = None
+        try:
+            self.room_cache = RoomCache()
+        except OSError:
+            self.room_cache = None
         self.init_ui()
+        self.settings_panel.show_cache_stats(self.room_cache.stats() if self.room_cache else None)
 
     def init_ui(self):
         self.setWindowTitle("Cedural - Tilemaps Generator")
@@ -63,10 +81,35 @@ class MainWindow(QMainWindow):
         # Add vertical splitter to left layout
         left_layout.addWidget(vertical_splitter)
 
+        # Coalesce tile setting edits so holding an arrow or typing re-slices only once
+        self.tile_settings_timer = QTimer(self)
+        self.tile_settings_timer.setSingleShot(True)
+        self.tile_settings_timer.setInterval(250)
+        self.tile_settings_timer.timeout.connect(self.update_tileset_grid)
+
         # Connect settings panel signals
-        self.settings_panel.tile_width_spin.valueChanged.connect(self.update_tileset_grid)
-        self.settings_panel.tile_height_spin.valueChanged.connect(self.update_tileset_grid)
-        self.settings_panel.tile_spacing_spin.valueChanged.connect(self.update_tileset_grid)
+        self.settings_panel.tile_width_spin.valueChanged.connect(self.schedule_tileset_grid_update)
+        self.settings_panel.tile_height_spin.valueChanged.connect(self.schedule_tileset_grid_update)
+        self.settings_panel.tile_spacing_spin.valueChanged.connect(self.schedule_tileset_grid_update)
+
+        self.settings_panel.generate_btn.clicked.connect(self.generate_room)
+        self.settings_panel.generate_best_btn.clicked.connect(self.generate_best_rooms)
+        self.tileset_panel.tilePropertiesChanged.connect(self.update_preview_properties)
+        self.tileset_panel.tilesChanged.connect(
+            lambda name, tile_ids: self.preview_panel.refresh_tiles(tile_ids)
+        )
+        self.settings_panel.mode_combo.currentIndexChanged.connect(self.update_preview_properties)
+        self.settings_panel.wall_tile_spin.valueChanged.connect(self.update_preview_properties)
+        self.update_preview_properties()
+        self.workspace_panel.workspace_tree.roomGridSelected.connect(self.show_workspace_room)
+        self.settings_panel.pause_btn.toggled.connect(self.toggle_generation_pause)
+        self.settings_panel.cancel_btn.clicked.connect(self.cancel_generation)
+        self.preview_panel.generationFinished.connect(self.on_generation_finished)
+        self.preview_panel.endlessToggled.connect(self.toggle_endless_preview)
+        self.settings_panel.export_collision_btn.clicked.connect(self.export_collision)
+        self.settings_panel.learn_rules_btn.clicked.connect(self.learn_rules_from_sample)
+        self.settings_panel.clear_rules_btn.clicked.connect(self.clear_learned_rules)
+        self.tileset_panel.atlasChanged.connect(self.check_learned_rules)
 
         # Add to main splitter
         main_splitter.addWidget(left_container)
@@ -79,10 +122,213 @@ class MainWindow(QMainWindow):
         # Add to main layout
         main_layout.addWidget(main_splitter)
 
+    def schedule_tileset_grid_update(self):
+        # Restarting the timer pushes the update back until edits settle
+        self.tile_settings_timer.start()
+
     def update_tileset_grid(self):
         if hasattr(self, 'tileset_panel') and hasattr(self.tileset_panel, 'tileset_viewer'):
-            self.tileset_panel.tileset_viewer.setTileSize(
+            self.tileset_panel.set_tile_geometry(
                 self.settings_panel.tile_width_spin.value(),
                 self.settings_panel.tile_height_spin.value(),
                 self.settings_panel.tile_spacing_spin.value()
-            )
\ No newline at end of file
+            )
+
+    def current_rules(self):
+        """Rules learned from a sample take over from the tileset's edge matching"""
+        if self.learned_rules is not None:
+            return self.learned_rules
+        return self.tileset_panel.adjacency_rules()
+
+    def learn_rules_from_sample(self):
+        file_name, _ = QFileDialog.getOpenFileName(
+            self,
+            "Load Sample Room",
+            "",
+            "Image Files (*.png *.bmp);;All Files (*)"
+        )
+        if not file_name:
+            return
+
+        settings = self.settings_panel
+        try:
+            grid = self.tileset_panel.sample_grid(Image.open(file_name))
+            patterns = extract_patterns(
+                grid,
+                settings.pattern_size_spin.value(),
+                rotations=settings.rotations_check.isChecked(),
+                reflections=settings.reflections_check.isChecked()
+            )
+        except (OSError, ValueError) as e:
+            settings.rules_status.setText(f"Could not learn rules: {e}")
+            return
+
+        self.learned_rules = patterns.to_rules()
+        settings.rules_status.setText(
+            f"Learned {patterns.count} patterns from {os.path.basename(file_name)}"
+        )
+
+    def clear_learned_rules(self):
+        self.learned_rules = None
+        self.settings_panel.rules_status.setText("Edge matching (from tileset)")
+
+    def check_learned_rules(self):
+        """Drops learned rules once a tile they use is re-sliced or removed, its id is gone"""
+        if self.learned_rules is None:
+            return
+        atlas = self.tileset_panel.atlas
+        try:
+            for tile_id in np.unique(self.learned_rules.tile_ids):
+                atlas.sheet_for(int(tile_id))
+        except KeyError:
+            self.clear_learned_rules()
+            self.settings_panel.rules_status.setText(
+                "Edge matching (learned rules cleared, their tileset changed)"
+            )
+
+    def toggle_endless_preview(self, checked):
+        if not checked:
+            return
+
+        rules = self.current_rules()
+        if rules is None or rules.count == 0:
+            self.preview_panel.show_message("Load a tileset whose tiles fit together to explore")
+            return
+
+        if self.settings_panel.random_seed_check.isChecked():
+            self.settings_panel.next_seed()
+        settings = self.settings_panel.generation_settings()
+        chunk_size = settings.chunk_size
+        streamer = ChunkStreamer(chunk_size, WfcChunkSource(rules, settings.seed, chunk_size))
+
+        atlas = self.tileset_panel.atlas
+        tile_width, tile_height, _ = self.tileset_panel.tile_geometry()
+        self.preview_panel.start_endless(
+            streamer,
+            lambda tiles: self.preview_panel.render_grid(tiles, atlas, tile_width, tile_height),
+            chunk_size * tile_width
+        )
+
+    def closeEvent(self, event):
+        self.cancel_generation()
+        self.preview_panel.stop_endless()
+        super().closeEvent(event)
+
+    def generation_request(self):
+        """Returns (settings, rules) for the next run, or None after explaining why not"""
+        if self.settings_panel.random_seed_check.isChecked():
+            self.settings_panel.next_seed()
+        settings = self.settings_panel.generation_settings()
+
+        rules = None
+        if settings.mode != CAVE:
+            rules = self.current_rules()
+            if rules is None:
+                self.preview_panel.show_message("Load a tileset to generate with constraints")
+                return None
+            if rules.count == 0:
+                self.preview_panel.show_message("No tiles of this tileset fit together")
+                return None
+        return settings, rules
+
+    def generate_room(self):
+        request = self.generation_request()
+        if request is None:
+            return
+        settings, rules = request
+        cache = self.room_cache if self.settings_panel.use_cache_check.isChecked() else None
+        # Cave rooms do not depend on the tileset, so they stay shared across sheets
+        tile_data = None
+        if rules is not None:
+            tile_data = self.tileset_panel.tile_data.get(self.tileset_panel.current_tileset_name)
+        self.start_generation(GenerationJob(settings, rules, cache=cache, tile_data=tile_data))
+
+    def generate_best_rooms(self):
+        request = self.generation_request()
+        if request is None:
+            return
+        settings, rules = request
+        if settings.mode == WORLD:
+            self.preview_panel.show_message("Best of N is not available for world maps")
+            return
+
+        panel = self.settings_panel
+        self.start_generation(BestOfJob(
+            settings,
+            rules,
+            panel.candidates_spin.value(),
+            panel.keep_best_spin.value(),
+            panel.score_threshold_spin.value() / 100,
+            self.room_properties(),
+            panel.reject_unreachable_check.isChecked()
+        ))
+
+    def room_properties(self):
+        """Tile properties for validating rooms; in cave mode the wall tile is always solid"""
+        properties = self.tileset_panel.tile_properties.copy()
+        if self.settings_panel.mode_combo.currentData() == CAVE:
+            properties.set_flag(self.settings_panel.wall_tile_spin.value(), SOLID)
+        return properties
+
+    def export_collision(self):
+        grid = self.preview_panel.current_grid
+        if grid is None:
+            self.preview_panel.show_message("Generate or open a room to export its collision")
+            return
+
+        file_name, _ = QFileDialog.getSaveFileName(
+            self,
+            "Export Collision",
+            "",
+            "JSON Files (*.json);;All Files (*)"
+        )
+        if not file_name:
+            return
+
+        tile_width, tile_height, _ = self.tileset_panel.tile_geometry()
+        try:
+            write_collision(file_name, grid, self.room_properties(), tile_width, tile_height)
+        except OSError as e:
+            self.preview_panel.show_message(f"Could not export collision: {e}")
+
+    def update_preview_properties(self):
+        properties = self.room_properties()
+        self.preview_panel.set_tile_properties(properties)
+        # Property names double as tile groups in the room search
+        self.workspace_panel.set_tile_groups({
+            name.lower(): properties.tiles_with(flag) for flag, name in FLAG_NAMES.items()
+        })
+
+    def start_generation(self, job):
+        self.cancel_generation()
+        self.generation_job = job
+        settings = job.settings
+        tile_width, tile_height, _ = self.tileset_panel.tile_geometry()
+        self.preview_panel.start_stream(job, settings.width, settings.height,
+                                        self.tileset_panel.atlas, tile_width, tile_height)
+        job.start()
+        self.settings_panel.set_generating(True)
+
+    def show_workspace_room(self, grid):
+        tile_width, tile_height, _ = self.tileset_panel.tile_geometry()
+        self.preview_panel.show_room(grid, self.tileset_panel.atlas, tile_width, tile_height)
+
+    def toggle_generation_pause(self, paused):
+        if self.generation_job is None:
+            return
+        if paused:
+            self.generation_job.pause()
+        else:
+            self.generation_job.resume()
+
+    def cancel_generation(self):
+        if self.generation_job is not None:
+            self.generation_job.cancel()
+
+    def on_generation_finished(self, kind):
+        if kind == DONE and isinstance(self.generation_job, BestOfJob):
+            self.workspace_panel.add_candidates(self.generation_job.candidates)
+        if self.generation_job.cache is not None:
+            self.settings_panel.show_cache_stats(self.generation_job.cache.stats())
+        self.generation_job = None
+        self.settings_panel.set_generating(False)
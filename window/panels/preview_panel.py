@@ -1,16 +1,416 @@
-from PySide6.QtWidgets import QWidget
+from PySide6.QtWidgets import (QWidget, QLabel, QScrollArea, QStackedWidget, QPushButton,
+                               QHBoxLayout, QCheckBox)
+from PySide6.QtGui import QImage, QPixmap, QPainter, QColor
+from PySide6.QtCore import Qt, QPoint, QRect, QTimer, Signal
+from collections import OrderedDict
+import math
+import queue
+import time
+import numpy as np
+from core.job import BATCH, CHUNK, RESET, DONE, FAILED
+from core.connectivity import validate_room
+from core.properties import TileProperties
 from .base_panel import BasePanel
 
+# Longest side of a room preview in pixels, larger rooms are drawn with smaller tiles
+MAX_PREVIEW_SIZE = 4096
+
+
+def array_to_pixmap(pixels):
+    """Converts an RGBA uint8 array into a QPixmap"""
+    pixels = np.ascontiguousarray(pixels)
+    height, width = pixels.shape[:2]
+    image = QImage(pixels.data, width, height, width * 4, QImage.Format_RGBA8888)
+    return QPixmap.fromImage(image.copy())
+
+
+def preview_cell(rows, cols, tile_width, tile_height):
+    """Returns the (width, height) to draw each tile of a room with, the tile size shrunk
+    so the whole room fits in MAX_PREVIEW_SIZE
+    """
+    scale = min(1.0, MAX_PREVIEW_SIZE / max(cols * tile_width, rows * tile_height))
+    return max(1, int(tile_width * scale)), max(1, int(tile_height * scale))
+
+
+def grid_colors(grid):
+    """Gives every tile id a stable color, for previews without a matching tileset"""
+    ids = np.asarray(grid, dtype=np.int64)
+    hashed = (ids * 2654435761) & 0xFFFFFF
+    colors = np.empty(ids.shape + (4,), dtype=np.uint8)
+    colors[..., 0] = hashed >> 16
+    colors[..., 1] = (hashed >> 8) & 0xFF
+    colors[..., 2] = hashed & 0xFF
+    colors[..., 3] = np.where(ids < 0, 0, 255)
+    return colors
+
+
+def reachability_overlay(validation):
+    """Tints unreachable walkable cells red and doors green, one pixel per cell"""
+    overlay = np.zeros(validation.walkable.shape + (4,), dtype=np.uint8)
+    overlay[validation.unreachable] = (220, 60, 60, 140)
+    if len(validation.doors):
+        overlay[validation.doors[:, 0], validation.doors[:, 1]] = (60, 200, 90, 180)
+    return overlay
+
+
+class EndlessView(QWidget):
+    """Pannable view over an unbounded map whose chunks come from a ChunkStreamer"""
+    def __init__(self):
+        super().__init__()
+        self.streamer = None
+        self.render_chunk = None
+        self.chunk_pixels = 64
+        self.offset = QPoint(0, 0)
+        self.drag_start = None
+        self.chunk_pixmaps = OrderedDict()
+        self.setMinimumSize(100, 100)
+
+        self.drain_timer = QTimer(self)
+        self.drain_timer.setInterval(30)
+        self.drain_timer.timeout.connect(self.drain)
+
+    def start(self, streamer, render_chunk, chunk_pixels):
+        self.stop()
+        self.streamer = streamer
+        self.render_chunk = render_chunk
+        self.chunk_pixels = chunk_pixels
+        self.offset = QPoint(0, 0)
+        self.streamer.start()
+        self.drain_timer.start()
+        self.request_visible()
+        self.update()
+
+    def stop(self):
+        if self.streamer:
+            self.drain_timer.stop()
+            self.streamer.stop()
+            self.streamer = None
+        self.chunk_pixmaps.clear()
+
+    def visible_chunks(self, margin=0):
+        """Returns the visible chunk keys, nearest to the center of the view first"""
+        size = self.chunk_pixels
+        first_col = math.floor(self.offset.x() / size) - margin
+        first_row = math.floor(self.offset.y() / size) - margin
+        last_col = math.floor((self.offset.x() + self.width()) / size) + margin
+        last_row = math.floor((self.offset.y() + self.height()) / size) + margin
+        center_col = (self.offset.x() + self.width() / 2) / size
+        center_row = (self.offset.y() + self.height() / 2) / size
+        keys = [(row, col) for row in range(first_row, last_row + 1)
+                for col in range(first_col, last_col + 1)]
+        keys.sort(key=lambda key: (key[0] + 0.5 - center_row) ** 2 + (key[1] + 0.5 - center_col) ** 2)
+        return keys
+
+    def request_visible(self):
+        if self.streamer:
+            wanted = [key for key in self.visible_chunks(margin=1) if key not in self.chunk_pixmaps]
+            self.streamer.request(wanted)
+
+    def drain(self):
+        keep = set(self.visible_chunks(margin=1))
+        changed = False
+        while True:
+            try:
+                key, tiles = self.streamer.results.get_nowait()
+            except queue.Empty:
+                break
+            if key in keep:
+                self.chunk_pixmaps[key] = self.render_chunk(tiles)
+                changed = True
+
+        # Chunks far from the viewport only live in the streamer's cache
+        for key in [key for key in self.chunk_pixmaps if key not in keep]:
+            del self.chunk_pixmaps[key]
+        if changed:
+            self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor("#1E1E1E"))
+        size = self.chunk_pixels
+        for row, col in self.visible_chunks():
+            target = QRect(col * size - self.offset.x(), row * size - self.offset.y(), size, size)
+            pixmap = self.chunk_pixmaps.get((row, col))
+            if pixmap:
+                painter.drawPixmap(target, pixmap)
+            else:
+                painter.fillRect(target.adjusted(1, 1, -1, -1), QColor("#252526"))
+        painter.end()
+
+    def scroll_by(self, dx, dy):
+        self.offset += QPoint(dx, dy)
+        self.request_visible()
+        self.update()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.drag_start = event.position().toPoint()
+
+    def mouseMoveEvent(self, event):
+        if self.drag_start is not None:
+            position = event.position().toPoint()
+            delta = self.drag_start - position
+            self.drag_start = position
+            self.scroll_by(delta.x(), delta.y())
+
+    def mouseReleaseEvent(self, event):
+        self.drag_start = None
+
+    def wheelEvent(self, event):
+        delta = event.angleDelta()
+        if event.modifiers() & Qt.ShiftModifier:
+            self.scroll_by(-delta.y(), 0)
+        else:
+            self.scroll_by(-delta.x(), -delta.y())
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.request_visible()
+
+
+class StreamCanvas(QWidget):
+    """Shows a room while it is generated. Tiles are painted into an image the canvas owns,
+    and only the parts that changed are repainted on screen.
+    """
+    def __init__(self):
+        super().__init__()
+        self.image = QImage()
+
+    def start(self, width, height):
+        self.image = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+        self.image.fill(QColor("#1E1E1E"))
+        self.setFixedSize(width, height)
+        self.update()
+
+    def clear(self):
+        self.image = QImage()
+        self.setFixedSize(0, 0)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.drawImage(event.rect(), self.image, event.rect())
+        painter.end()
+
+
 class PreviewPanel(BasePanel):
+    endlessToggled = Signal(bool)
+    generationFinished = Signal(str)
+
     def __init__(self):
         super().__init__("Room Preview")
+        self.current_grid = None
+        self.stream_job = None
+        self.stream_tiles = {}
+        self.display_args = (None, None, None)
+        self.tile_properties = TileProperties()
         self.init_panel()
 
+        self.stream_timer = QTimer(self)
+        self.stream_timer.setInterval(30)
+        self.stream_timer.timeout.connect(self.drain_stream)
+
     def init_panel(self):
+        self.endless_button = QPushButton("Endless Preview")
+        self.endless_button.setCheckable(True)
+        self.endless_button.setMinimumHeight(30)
+        self.endless_button.toggled.connect(self.on_endless_toggled)
+
+        self.overlay_check = QCheckBox("Reachability Overlay")
+        self.overlay_check.setStyleSheet("color: #CCCCCC;")
+        self.overlay_check.toggled.connect(self.refresh_room)
+
+        self.validation_label = QLabel()
+        self.validation_label.setStyleSheet("color: #CCCCCC;")
+
+        tools_container = QWidget()
+        tools_layout = QHBoxLayout(tools_container)
+        tools_layout.setContentsMargins(0, 0, 0, 5)
+        tools_layout.addWidget(self.endless_button)
+        tools_layout.addWidget(self.overlay_check)
+        tools_layout.addWidget(self.validation_label, 1)
+        self.content_layout.addWidget(tools_container)
+
+        self.stack = QStackedWidget()
+        self.content_layout.addWidget(self.stack)
+
         # Área de previsualización de la sala
-        preview_area = QWidget()
+        preview_area = QScrollArea()
+        preview_area.setWidgetResizable(True)
         preview_area.setStyleSheet("""
             background-color: #1E1E1E;
             border: 1px dashed #454545;
         """)
-        self.content_layout.addWidget(preview_area)
\ No newline at end of file
+
+        self.room_view = QLabel()
+        self.room_view.setAlignment(Qt.AlignCenter)
+        self.room_view.setStyleSheet("color: #666666; border: none;")
+        preview_area.setWidget(self.room_view)
+        self.stack.addWidget(preview_area)
+
+        self.endless_view = EndlessView()
+        self.stack.addWidget(self.endless_view)
+
+        stream_area = QScrollArea()
+        stream_area.setAlignment(Qt.AlignCenter)
+        stream_area.setStyleSheet("background-color: #1E1E1E; border: 1px dashed #454545;")
+        self.stream_canvas = StreamCanvas()
+        stream_area.setWidget(self.stream_canvas)
+        self.stack.addWidget(stream_area)
+
+    def on_endless_toggled(self, checked):
+        if not checked:
+            self.endless_view.stop()
+            self.stack.setCurrentIndex(2 if self.stream_job is not None else 0)
+        self.endlessToggled.emit(checked)
+
+    def start_endless(self, streamer, render_chunk, chunk_pixels):
+        self.stack.setCurrentIndex(1)
+        self.endless_view.start(streamer, render_chunk, chunk_pixels)
+
+    def stop_endless(self):
+        self.endless_button.setChecked(False)
+
+    def start_stream(self, job, width, height, atlas=None, tile_width=None, tile_height=None):
+        """Follows a running GenerationJob, painting cells as they are decided"""
+        self.stream_job = job
+        self.stop_endless()
+        self.stack.setCurrentIndex(2)
+        self.stream_args = (atlas, tile_width, tile_height)
+        self.stream_tiles = {}
+        if atlas is not None and atlas.sheets and tile_width and tile_height:
+            self.stream_cell = preview_cell(height, width, tile_width, tile_height)
+        else:
+            cell = max(1, min(16, 1024 // max(width, height)))
+            self.stream_cell = (cell, cell)
+
+        self.stream_canvas.start(width * self.stream_cell[0], height * self.stream_cell[1])
+        self.stream_timer.start()
+
+    def stream_tile(self, tile_id):
+        pixmap = self.stream_tiles.get(tile_id)
+        if pixmap is None:
+            atlas, tile_width, tile_height = self.stream_args
+            grid = np.array([[tile_id]])
+            pixmap = self.render_grid(grid, atlas, tile_width, tile_height, self.stream_cell)
+            self.stream_tiles[tile_id] = pixmap
+        return pixmap
+
+    def drain_stream(self):
+        cell_width, cell_height = self.stream_cell
+        finished = None
+        # Paint within a time budget, whatever is left waits for the next tick
+        deadline = time.monotonic() + 0.015
+        painter = QPainter(self.stream_canvas.image)
+        while time.monotonic() < deadline:
+            try:
+                event = self.stream_job.events.get_nowait()
+            except queue.Empty:
+                break
+
+            kind = event[0]
+            if kind == BATCH:
+                ys, xs, tile_ids = event[1:]
+                for y, x, tile_id in zip(ys, xs, tile_ids):
+                    painter.drawPixmap(int(x) * cell_width, int(y) * cell_height,
+                                       self.stream_tile(int(tile_id)))
+                left, top = int(xs.min()), int(ys.min())
+                self.stream_canvas.update(left * cell_width, top * cell_height,
+                                          (int(xs.max()) - left + 1) * cell_width,
+                                          (int(ys.max()) - top + 1) * cell_height)
+            elif kind == CHUNK:
+                _, y, x, tiles = event
+                target = QRect(x * cell_width, y * cell_height,
+                               tiles.shape[1] * cell_width, tiles.shape[0] * cell_height)
+                painter.drawPixmap(target, self.render_grid(tiles, *self.stream_args,
+                                                            cell=self.stream_cell))
+                self.stream_canvas.update(target)
+            elif kind == RESET:
+                painter.fillRect(self.stream_canvas.image.rect(), QColor("#1E1E1E"))
+                self.stream_canvas.update()
+            else:
+                finished = event
+                break
+        painter.end()
+
+        if finished:
+            self.finish_stream(finished)
+
+    def finish_stream(self, event):
+        self.stream_timer.stop()
+        self.stream_job = None
+        self.stream_canvas.clear()
+        self.stack.setCurrentIndex(0)
+        kind = event[0]
+        if kind == DONE:
+            self.display_room(event[1], *self.stream_args)
+        elif kind == FAILED:
+            self.show_message(f"Generation failed: {event[1]}")
+        self.generationFinished.emit(kind)
+
+    def show_message(self, text):
+        self.stop_endless()
+        self.room_view.clear()
+        self.room_view.setText(text)
+
+    def show_room(self, grid, atlas=None, tile_width=None, tile_height=None):
+        """Draws a grid of global tile ids, from the atlas when it has every tile. Ignored
+        while a generation is streaming, its next batch would paint over the room.
+        """
+        if self.stream_job is not None:
+            return
+        self.stop_endless()
+        self.display_room(grid, atlas, tile_width, tile_height)
+
+    def display_room(self, grid, atlas=None, tile_width=None, tile_height=None):
+        self.current_grid = grid
+        self.display_args = (atlas, tile_width, tile_height)
+        pixmap = self.render_grid(grid, atlas, tile_width, tile_height)
+
+        self.validation_label.clear()
+        if self.overlay_check.isChecked():
+            validation = validate_room(grid, self.tile_properties)
+            painter = QPainter(pixmap)
+            painter.drawPixmap(pixmap.rect(), array_to_pixmap(reachability_overlay(validation)))
+            painter.end()
+            state = "reachable" if validation.reachable else "unreachable areas"
+            self.validation_label.setText(f"{validation.components} regions, {state}")
+
+        self.room_view.setPixmap(pixmap)
+
+    def refresh_room(self):
+        if self.current_grid is not None and self.stream_job is None:
+            self.display_room(self.current_grid, *self.display_args)
+
+    def refresh_tiles(self, tile_ids):
+        """Redraws whatever shows tiles whose pixels changed"""
+        for tile_id in tile_ids:
+            self.stream_tiles.pop(tile_id, None)
+        if self.endless_view.streamer:
+            self.endless_view.chunk_pixmaps.clear()
+            self.endless_view.request_visible()
+        if self.current_grid is not None and np.isin(self.current_grid, tile_ids).any():
+            self.refresh_room()
+
+    def set_tile_properties(self, properties):
+        self.tile_properties = properties
+        if self.overlay_check.isChecked():
+            self.refresh_room()
+
+    def render_grid(self, grid, atlas=None, tile_width=None, tile_height=None, cell=None):
+        """Draws a grid with its tiles at cell (width, height), by default the largest size
+        that keeps the room within MAX_PREVIEW_SIZE
+        """
+        pixels = None
+        if atlas is not None and tile_width and tile_height:
+            try:
+                pixels = atlas.compose_room(grid, tile_width, tile_height, *(
+                    cell or preview_cell(*grid.shape, tile_width, tile_height)))
+            except (KeyError, ValueError, MemoryError):
+                pixels = None
+
+        if pixels is None:
+            pixels = grid_colors(grid)
+            cell_width, cell_height = cell or (max(1, min(16, 1024 // max(grid.shape))),) * 2
+            pixels = pixels.repeat(cell_height, axis=0).repeat(cell_width, axis=1)
+
+        return array_to_pixmap(pixels)
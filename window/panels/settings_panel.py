@@ -1,7 +1,34 @@
+import random
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QLabel, QPushButton,
-                               QSpinBox, QGroupBox, QHBoxLayout)
+                               QSpinBox, QGroupBox, QHBoxLayout, QComboBox, QCheckBox)
+from core.generator import (GenerationSettings, CONSTRAINT, CAVE, WORLD, MIN_ROOM_SIZE,
+                            MAX_ROOM_SIZE, MIN_CHUNK_SIZE, MAX_CHUNK_SIZE, MAX_ITERATIONS)
 from .base_panel import BasePanel
 
+SPIN_BOX_STYLE = """
+    QSpinBox {
+        background-color: #1E1E1E;
+        color: #CCCCCC;
+        border: 1px solid #454545;
+        padding: 2px;
+    }
+"""
+
+GROUP_BOX_STYLE = """
+    QGroupBox {
+        border: 1px solid #454545;
+        border-radius: 5px;
+        margin-top: 10px;
+        padding-top: 10px;
+    }
+    QGroupBox::title {
+        color: #CCCCCC;
+        subcontrol-origin: margin;
+        subcontrol-position: top left;
+        left: 10px;
+    }
+"""
+
 
 class SettingsPanel(BasePanel):
     def __init__(self):
@@ -17,6 +44,10 @@ class SettingsPanel(BasePanel):
         size_group = self.create_size_controls()
         self.content_layout.addWidget(size_group)
 
+        # Generator mode Controls
+        generator_group = self.create_generator_controls()
+        self.content_layout.addWidget(generator_group)
+
         # Rules Section
         rules_group = self.create_rules_section()
         self.content_layout.addWidget(rules_group)
@@ -51,8 +82,8 @@ class SettingsPanel(BasePanel):
         width_layout = QHBoxLayout()
         width_label = QLabel("Width:")
         width_label.setStyleSheet("color: #CCCCCC;")
-        width_spin = QSpinBox()
-        width_spin.setRange(5, 100)
+        self.room_width_spin = width_spin = QSpinBox()
+        width_spin.setRange(MIN_ROOM_SIZE, MAX_ROOM_SIZE[CONSTRAINT])
         width_spin.setValue(20)
         width_spin.setStyleSheet("""
             QSpinBox {
@@ -69,8 +100,8 @@ class SettingsPanel(BasePanel):
         height_layout = QHBoxLayout()
         height_label = QLabel("Height:")
         height_label.setStyleSheet("color: #CCCCCC;")
-        height_spin = QSpinBox()
-        height_spin.setRange(5, 100)
+        self.room_height_spin = height_spin = QSpinBox()
+        height_spin.setRange(MIN_ROOM_SIZE, MAX_ROOM_SIZE[CONSTRAINT])
         height_spin.setValue(15)
         height_spin.setStyleSheet("""
             QSpinBox {
@@ -89,6 +120,94 @@ class SettingsPanel(BasePanel):
 
         return group
 
+    def create_spin_row(self, layout, text, minimum, maximum, value):
+        row = QWidget()
+        row_layout = QHBoxLayout(row)
+        row_layout.setContentsMargins(0, 0, 0, 0)
+        label = QLabel(text)
+        label.setStyleSheet("color: #CCCCCC;")
+        spin = QSpinBox()
+        spin.setRange(minimum, maximum)
+        spin.setValue(value)
+        spin.setStyleSheet(SPIN_BOX_STYLE)
+        row_layout.addWidget(label)
+        row_layout.addWidget(spin)
+        layout.addWidget(row)
+        return row, spin
+
+    def create_generator_controls(self):
+        group = QGroupBox("Generator")
+        group.setStyleSheet(GROUP_BOX_STYLE)
+
+        layout = QVBoxLayout()
+
+        # Mode selector
+        mode_layout = QHBoxLayout()
+        mode_label = QLabel("Mode:")
+        mode_label.setStyleSheet("color: #CCCCCC;")
+        self.mode_combo = QComboBox()
+        self.mode_combo.addItem("Constraint Solving", CONSTRAINT)
+        self.mode_combo.addItem("Cave (Cellular Automata)", CAVE)
+        self.mode_combo.addItem("World (Chunked)", WORLD)
+        self.mode_combo.currentIndexChanged.connect(self.on_mode_changed)
+        mode_layout.addWidget(mode_label)
+        mode_layout.addWidget(self.mode_combo)
+        layout.addLayout(mode_layout)
+
+        # Seed
+        _, self.seed_spin = self.create_spin_row(layout, "Seed:", 0, 2 ** 31 - 1, 0)
+        self.random_seed_check = QCheckBox("Random seed")
+        self.random_seed_check.setStyleSheet("color: #CCCCCC;")
+        self.random_seed_check.setChecked(True)
+        layout.addWidget(self.random_seed_check)
+
+        # Cave settings, only shown in cave mode
+        self.cave_rows = []
+        row, self.cave_iterations_spin = self.create_spin_row(layout, "Iterations:", 0, MAX_ITERATIONS, 5)
+        self.cave_rows.append(row)
+        row, self.cave_fill_spin = self.create_spin_row(layout, "Fill %:", 0, 100, 45)
+        self.cave_rows.append(row)
+        row, self.wall_tile_spin = self.create_spin_row(layout, "Wall Tile:", 0, 65535, 0)
+        self.cave_rows.append(row)
+        row, self.floor_tile_spin = self.create_spin_row(layout, "Floor Tile:", 0, 65535, 1)
+        self.cave_rows.append(row)
+
+        # World settings, only shown in world mode
+        self.world_row, self.chunk_size_spin = self.create_spin_row(
+            layout, "Chunk Size:", MIN_CHUNK_SIZE, MAX_CHUNK_SIZE, 64)
+
+        group.setLayout(layout)
+        self.on_mode_changed()
+        return group
+
+    def on_mode_changed(self):
+        mode = self.mode_combo.currentData()
+        for row in self.cave_rows:
+            row.setVisible(mode == CAVE)
+        self.world_row.setVisible(mode == WORLD)
+
+        # Caves are cheap and worlds are split into chunks, so both go past the single room limit
+        maximum = MAX_ROOM_SIZE[mode]
+        self.room_width_spin.setMaximum(maximum)
+        self.room_height_spin.setMaximum(maximum)
+
+    def next_seed(self):
+        self.seed_spin.setValue(random.randrange(self.seed_spin.maximum() + 1))
+
+    def generation_settings(self):
+        """Builds the generator settings from the current controls"""
+        return GenerationSettings(
+            width=self.room_width_spin.value(),
+            height=self.room_height_spin.value(),
+            mode=self.mode_combo.currentData(),
+            seed=self.seed_spin.value(),
+            iterations=self.cave_iterations_spin.value(),
+            fill_ratio=self.cave_fill_spin.value() / 100,
+            wall_tile=self.wall_tile_spin.value(),
+            floor_tile=self.floor_tile_spin.value(),
+            chunk_size=self.chunk_size_spin.value()
+        )
+
     def create_rules_section(self):
         group = QGroupBox("Rules")
         group.setStyleSheet("""
@@ -108,14 +227,28 @@ class SettingsPanel(BasePanel):
 
         layout = QVBoxLayout()
 
-        # Placeholder para futuras reglas
-        placeholder = QWidget()
-        placeholder.setStyleSheet("""
-            background-color: #1E1E1E;
-            border: 1px dashed #454545;
-        """)
-        placeholder.setMinimumHeight(200)
-        layout.addWidget(placeholder)
+        self.rules_status = QLabel("Edge matching (from tileset)")
+        self.rules_status.setStyleSheet("color: #CCCCCC;")
+        self.rules_status.setWordWrap(True)
+        layout.addWidget(self.rules_status)
+
+        # Overlapping model options for rules learned from a sample room
+        _, self.pattern_size_spin = self.create_spin_row(layout, "Pattern Size:", 2, 5, 3)
+        self.rotations_check = QCheckBox("Rotations")
+        self.rotations_check.setStyleSheet("color: #CCCCCC;")
+        self.reflections_check = QCheckBox("Reflections")
+        self.reflections_check.setStyleSheet("color: #CCCCCC;")
+        symmetry_layout = QHBoxLayout()
+        symmetry_layout.addWidget(self.rotations_check)
+        symmetry_layout.addWidget(self.reflections_check)
+        layout.addLayout(symmetry_layout)
+
+        self.learn_rules_btn = QPushButton("Learn from Sample...")
+        self.learn_rules_btn.setMinimumHeight(30)
+        self.clear_rules_btn = QPushButton("Clear Learned Rules")
+        self.clear_rules_btn.setMinimumHeight(30)
+        layout.addWidget(self.learn_rules_btn)
+        layout.addWidget(self.clear_rules_btn)
 
         group.setLayout(layout)
         return group
@@ -140,7 +273,7 @@ class SettingsPanel(BasePanel):
         layout = QVBoxLayout()
 
         # Generate button
-        generate_btn = QPushButton("Generate")
+        self.generate_btn = generate_btn = QPushButton("Generate")
         generate_btn.setObjectName("generateButton")
         generate_btn.setMinimumHeight(30)
 
@@ -152,13 +285,69 @@ class SettingsPanel(BasePanel):
         load_btn = QPushButton("Load Configuration")
         load_btn.setMinimumHeight(30)
 
+        # Pause and Cancel act on the running generation
+        run_layout = QHBoxLayout()
+        self.pause_btn = QPushButton("Pause")
+        self.pause_btn.setCheckable(True)
+        self.pause_btn.setMinimumHeight(30)
+        self.pause_btn.toggled.connect(
+            lambda checked: self.pause_btn.setText("Resume" if checked else "Pause")
+        )
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.setMinimumHeight(30)
+        run_layout.addWidget(self.pause_btn)
+        run_layout.addWidget(self.cancel_btn)
+
         layout.addWidget(generate_btn)
+        layout.addLayout(run_layout)
+
+        # Rooms generated before are loaded from the on-disk room cache
+        self.use_cache_check = QCheckBox("Reuse cached rooms")
+        self.use_cache_check.setStyleSheet("color: #CCCCCC;")
+        self.use_cache_check.setChecked(True)
+        self.cache_stats_label = QLabel()
+        self.cache_stats_label.setStyleSheet("color: #999999;")
+        layout.addWidget(self.use_cache_check)
+        layout.addWidget(self.cache_stats_label)
+
+        # Best of N: generate several candidates in parallel and keep the highest scored
+        _, self.candidates_spin = self.create_spin_row(layout, "Candidates:", 2, 256, 8)
+        _, self.keep_best_spin = self.create_spin_row(layout, "Keep Best:", 1, 32, 3)
+        _, self.score_threshold_spin = self.create_spin_row(layout, "Stop at Score %:", 0, 100, 100)
+        self.reject_unreachable_check = QCheckBox("Reject unreachable rooms")
+        self.reject_unreachable_check.setStyleSheet("color: #CCCCCC;")
+        layout.addWidget(self.reject_unreachable_check)
+        self.generate_best_btn = QPushButton("Generate Best")
+        self.generate_best_btn.setMinimumHeight(30)
+        layout.addWidget(self.generate_best_btn)
+
+        # Merged collision rectangles of the room shown in the preview
+        self.export_collision_btn = QPushButton("Export Collision...")
+        self.export_collision_btn.setMinimumHeight(30)
+        layout.addWidget(self.export_collision_btn)
+
         layout.addWidget(save_btn)
         layout.addWidget(load_btn)
 
         group.setLayout(layout)
+        self.set_generating(False)
         return group
 
+    def set_generating(self, generating):
+        if not generating:
+            self.pause_btn.setChecked(False)
+        self.pause_btn.setEnabled(generating)
+        self.cancel_btn.setEnabled(generating)
+
+    def show_cache_stats(self, stats):
+        if stats is None:
+            self.cache_stats_label.setText("Room cache unavailable")
+            return
+        self.cache_stats_label.setText(
+            f"Cache: {stats['hits']} hits, {stats['misses']} misses, "
+            f"{stats['entries']} rooms ({stats['bytes'] / 1024 / 1024:.1f} MB)"
+        )
+
     def create_tile_settings(self):
         group = QGroupBox("Tile Settings")
         group.setStyleSheet("""
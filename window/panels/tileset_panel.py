@@ -1,9 +1,20 @@
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QPushButton, QLabel,
-                               QFileDialog, QSizePolicy, QScrollArea, QHBoxLayout, QComboBox)
+                               QFileDialog, QSizePolicy, QScrollArea, QHBoxLayout, QComboBox,
+                               QCheckBox)
 from PySide6.QtGui import QPixmap, QImage, QPainter, QPen, QColor
-from PySide6.QtCore import Qt, QRect, Signal
+from PySide6.QtCore import Qt, QRect, Signal, QThreadPool, QFileSystemWatcher, QTimer
 from PIL import Image
 import io
+import os
+import numpy as np
+from core.atlas import TileAtlas
+from core.wfc import edge_rules
+from core.tileset import (image_to_array, compute_tile_data, match_tiles, changed_tiles,
+                          update_tile_data, slice_tiles, grid_shape)
+from core.properties import TileProperties, FLAG_NAMES
+from core.palette import (is_indexed, image_palette, remap_colors, reindex_image, sheet_array,
+                          to_indexed_image)
+from ..workers.tile_data_worker import TileDataWorker
 from .base_panel import BasePanel
 
 
@@ -57,7 +68,8 @@ class TilesetViewer(QLabel):
         self.tile_height = 32
         self.tile_spacing = 0
         self.selected_tile = None
-        self.original_pixmap = None  # Inicializamos el atributo
+        self.original_pixmap = None  # Untouched source, every crop is taken from it
+        self.base_pixmap = None  # Scaled and cropped to whole tiles, without the grid
         self.setMouseTracking(True)
         self.setAlignment(Qt.AlignCenter)
         self.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
@@ -70,15 +82,18 @@ class TilesetViewer(QLabel):
             self.updateGrid()
 
     def setTileSize(self, width, height, spacing):
+        if (width, height, spacing) == (self.tile_width, self.tile_height, self.tile_spacing):
+            return
         self.tile_width = width
         self.tile_height = height
         self.tile_spacing = spacing
-        if self.pixmap():
-            self.adjustSize()
+        self.selected_tile = None
+        if self.original_pixmap:
+            self.updatePixmap(self.original_pixmap)
             self.updateGrid()
 
     def updateGrid(self):
-        if self.pixmap():
+        if self.base_pixmap:
             self.drawGrid()
 
     def setPixmap(self, pixmap):
@@ -86,6 +101,11 @@ class TilesetViewer(QLabel):
             self.original_pixmap = pixmap
             self.updatePixmap(pixmap)
 
+    def clearPixmap(self):
+        self.original_pixmap = None
+        self.base_pixmap = None
+        self.clear()
+
     def updatePixmap(self, pixmap):
         if pixmap:
             scaled_pixmap = pixmap.scaled(
@@ -93,30 +113,51 @@ class TilesetViewer(QLabel):
                 Qt.KeepAspectRatio,
                 self.render_mode
             )
-            super().setPixmap(scaled_pixmap)
-            self.adjustSize()
+            self.adjustSize(scaled_pixmap)
 
-    def adjustSize(self):
-        if self.pixmap():
+    def adjustSize(self, pixmap=None):
+        pixmap = pixmap or self.original_pixmap
+        if pixmap:
             # Calculate the number of complete tiles that fit in the image
-            num_cols = self.pixmap().width() // (self.tile_width + self.tile_spacing)
-            num_rows = self.pixmap().height() // (self.tile_height + self.tile_spacing)
+            num_cols = pixmap.width() // (self.tile_width + self.tile_spacing)
+            num_rows = pixmap.height() // (self.tile_height + self.tile_spacing)
 
             # Set the size to exactly fit the complete tiles
             width = num_cols * (self.tile_width + self.tile_spacing)
             height = num_rows * (self.tile_height + self.tile_spacing)
 
-            # Create a new pixmap of the exact size needed
-            new_pixmap = self.pixmap().copy(0, 0, width, height)
-            super().setPixmap(new_pixmap)
+            # Crop a copy, the source pixmap is kept whole for later re-slicing
+            self.base_pixmap = pixmap.copy(0, 0, width, height)
+            super().setPixmap(self.base_pixmap)
             self.setFixedSize(width, height)
 
+    def replaceTiles(self, pixels, indices, columns, palette=None):
+        """Repaints only the given tiles of the sheet from new source pixels,
+        given as indices into palette when there is one
+        """
+        if not self.original_pixmap:
+            return
+        tiles = slice_tiles(pixels, self.tile_width, self.tile_height, self.tile_spacing)
+        for pixmap in (self.original_pixmap, self.base_pixmap):
+            painter = QPainter(pixmap)
+            painter.setCompositionMode(QPainter.CompositionMode_Source)
+            for index in indices:
+                row, col = divmod(int(index), columns)
+                tile = tiles[row, col] if palette is None else palette[tiles[row, col, ..., 0]]
+                tile = np.ascontiguousarray(tile)
+                image = QImage(tile.data, self.tile_width, self.tile_height,
+                               tile.strides[0], QImage.Format_RGBA8888)
+                painter.drawImage(col * (self.tile_width + self.tile_spacing),
+                                  row * (self.tile_height + self.tile_spacing), image)
+            painter.end()
+        self.drawGrid()
+
     def drawGrid(self):
-        if not self.pixmap():
+        if not self.base_pixmap:
             return
 
         # Create a new pixmap with the grid
-        grid_pixmap = QPixmap(self.pixmap())
+        grid_pixmap = QPixmap(self.base_pixmap)
         painter = QPainter(grid_pixmap)
         painter.setRenderHint(QPainter.Antialiasing, False)
 
@@ -144,18 +185,18 @@ class TilesetViewer(QLabel):
             painter.drawRect(x, y, self.tile_width, self.tile_height)
 
         painter.end()
-        self.setPixmap(grid_pixmap)
+        super().setPixmap(grid_pixmap)
 
     def mousePressEvent(self, event):
-        if not self.pixmap() or event.button() != Qt.LeftButton:
+        if not self.base_pixmap or event.button() != Qt.LeftButton:
             return
 
         pos = event.pos()
         col = pos.x() // (self.tile_width + self.tile_spacing)
         row = pos.y() // (self.tile_height + self.tile_spacing)
 
-        max_col = (self.pixmap().width() // (self.tile_width + self.tile_spacing)) - 1
-        max_row = (self.pixmap().height() // (self.tile_height + self.tile_spacing)) - 1
+        max_col = (self.base_pixmap.width() // (self.tile_width + self.tile_spacing)) - 1
+        max_row = (self.base_pixmap.height() // (self.tile_height + self.tile_spacing)) - 1
 
         if 0 <= col <= max_col and 0 <= row <= max_row:
             self.selected_tile = (row, col)
@@ -164,10 +205,33 @@ class TilesetViewer(QLabel):
 
 
 class TilesetPanel(BasePanel):
+    atlasChanged = Signal()
+    tileDataReady = Signal(str)
+    tilePropertiesChanged = Signal()
+    tilesChanged = Signal(str, object)  # Sheet name and global ids of tiles repainted in place
+
     def __init__(self, settings_panel=None):
         super().__init__("Tileset")
         self.settings_panel = settings_panel
         self.current_tileset = None
+        self.current_tileset_name = None
+        self.tilesets = {}  # Source images of every loaded sheet, by name
+        self.atlas = TileAtlas()
+        self.tile_data = {}  # Per-tile hashes and edges of every sheet, rebuilt in the background
+        self._tile_data_tokens = {}
+        self.tile_properties = TileProperties()
+        self.selected_tile_id = None
+        self.tileset_paths = {}
+        self._watched_pixels = {}  # Last decode of every watched sheet, to diff the next one against
+
+        # Editors write in bursts, so reload once the file has been quiet for a moment
+        self.file_watcher = QFileSystemWatcher(self)
+        self.file_watcher.fileChanged.connect(self.on_tileset_file_changed)
+        self._pending_reloads = set()
+        self.reload_timer = QTimer(self)
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(50)
+        self.reload_timer.timeout.connect(self.reload_pending_tilesets)
         self.init_panel()
 
     def init_panel(self):
@@ -201,13 +265,43 @@ class TilesetPanel(BasePanel):
         self.render_mode_combo.setFixedWidth(100)
         self.render_mode_combo.currentIndexChanged.connect(self.on_render_mode_changed)
 
+        # Keep sheets of up to 256 colors as palette indices, a quarter of the memory
+        self.indexed_check = QCheckBox("Indexed")
+        self.indexed_check.setStyleSheet("color: #CCCCCC;")
+        self.indexed_check.setToolTip("Store tilesets with 256 colors or fewer as palette indices")
+        self.indexed_check.toggled.connect(self.set_indexed_storage)
+
         controls_layout.addWidget(load_button)
         controls_layout.addWidget(self.render_mode_combo)
+        controls_layout.addWidget(self.indexed_check)
 
         # Add controls to main layout with no margins
         self.content_layout.addWidget(controls_container)
         self.content_layout.setSpacing(0)
 
+        # Loaded tilesets selector
+        sheets_container = QWidget()
+        sheets_layout = QHBoxLayout(sheets_container)
+        sheets_layout.setContentsMargins(0, 5, 0, 5)
+        sheets_layout.setSpacing(5)
+
+        self.tileset_combo = QComboBox()
+        self.tileset_combo.currentTextChanged.connect(self.show_tileset)
+
+        remove_button = QPushButton("Remove")
+        remove_button.setFixedWidth(100)
+        remove_button.clicked.connect(self.remove_current_tileset)
+
+        self.watch_check = QCheckBox("Watch file")
+        self.watch_check.setStyleSheet("color: #CCCCCC;")
+        self.watch_check.setToolTip("Reload the tileset when it changes on disk")
+        self.watch_check.toggled.connect(self.on_watch_toggled)
+
+        sheets_layout.addWidget(self.tileset_combo)
+        sheets_layout.addWidget(self.watch_check)
+        sheets_layout.addWidget(remove_button)
+        self.content_layout.addWidget(sheets_container)
+
         # Container for tile preview with exact height
         preview_container = QWidget()
         preview_container.setFixedHeight(100)
@@ -224,6 +318,20 @@ class TilesetPanel(BasePanel):
         preview_layout.addWidget(self.tile_preview, alignment=Qt.AlignCenter)
         self.content_layout.addWidget(preview_container)
 
+        # Properties of the selected tile
+        properties_container = QWidget()
+        properties_layout = QHBoxLayout(properties_container)
+        properties_layout.setContentsMargins(0, 5, 0, 5)
+        self.property_checks = {}
+        for flag, name in FLAG_NAMES.items():
+            check = QCheckBox(name)
+            check.setStyleSheet("color: #CCCCCC;")
+            check.setEnabled(False)
+            check.toggled.connect(lambda enabled, flag=flag: self.on_property_toggled(flag, enabled))
+            properties_layout.addWidget(check)
+            self.property_checks[flag] = check
+        self.content_layout.addWidget(properties_container)
+
         # Tileset viewer container
         viewer_container = QWidget()
         viewer_container.setStyleSheet("""
@@ -291,33 +399,323 @@ class TilesetPanel(BasePanel):
         if file_name:
             try:
                 image = Image.open(file_name)
-                buffer = io.BytesIO()
-                image.save(buffer, format="PNG")
-                buffer.seek(0)
+                image.load()
+                name = self.tileset_name(file_name)
+                if self.indexed_check.isChecked():
+                    # Sheets with too many colors stay full color
+                    image = to_indexed_image(image) or image
+
+                old_sheet = self.atlas.sheets.get(name)
+                self.atlas.add_tileset(name, image, *self.tile_geometry())
+                if old_sheet is not None:
+                    # Loading the same file again renumbers its tiles
+                    self.tile_properties.forget(old_sheet.tile_ids())
+                self.tilesets[name] = image
+                self.set_watching(name, name in self._watched_pixels, os.path.abspath(file_name))
+
+                # Shown once below, even when the same file was on display already
+                self.tileset_combo.blockSignals(True)
+                if self.tileset_combo.findText(name) < 0:
+                    self.tileset_combo.addItem(name)
+                self.tileset_combo.setCurrentText(name)
+                self.tileset_combo.blockSignals(False)
+                self.show_tileset(name, force=True)
+                self.schedule_tile_data(name)
+                self.atlasChanged.emit()
 
-                self.current_tileset = image
+            except Exception as e:
+                self.tileset_viewer.setText(f"Error loading tileset: {str(e)}")
+                self.current_tileset = None
 
-                pixmap = QPixmap()
-                pixmap.loadFromData(buffer.getvalue())
+    def tileset_name(self, path):
+        """Names a sheet after its file, numbered when another file has the same name"""
+        path = os.path.abspath(path)
+        base_name = os.path.basename(path)
+        name = base_name
+        number = 2
+        while name in self.tilesets and self.tileset_paths.get(name) != path:
+            name = f"{base_name} ({number})"
+            number += 1
+        return name
+
+    def tile_geometry(self):
+        """Returns (width, height, spacing) from the Tile Settings spinboxes"""
+        if self.settings_panel:
+            return (self.settings_panel.tile_width_spin.value(),
+                    self.settings_panel.tile_height_spin.value(),
+                    self.settings_panel.tile_spacing_spin.value())
+        viewer = self.tileset_viewer
+        return viewer.tile_width, viewer.tile_height, viewer.tile_spacing
+
+    def sheet_geometry(self, name):
+        """Returns the (width, height, spacing) a sheet was sliced with, falling back to
+        the spinboxes for sheets that are not in the atlas
+        """
+        sheet = self.atlas.sheets.get(name)
+        return sheet.geometry if sheet is not None else self.tile_geometry()
+
+    def show_geometry(self, width, height, spacing):
+        """Shows a geometry in the viewer and the spinboxes, without re-slicing anything"""
+        if self.settings_panel:
+            for spin, value in ((self.settings_panel.tile_width_spin, width),
+                                (self.settings_panel.tile_height_spin, height),
+                                (self.settings_panel.tile_spacing_spin, spacing)):
+                spin.blockSignals(True)
+                spin.setValue(value)
+                spin.blockSignals(False)
+        self.tileset_viewer.setTileSize(width, height, spacing)
+
+    def show_tileset(self, name, force=False):
+        """Displays one of the loaded sheets in the viewer, again with force if it already is"""
+        image = self.tilesets.get(name)
+        if image is None or (name == self.current_tileset_name and not force):
+            return
 
-                if self.settings_panel:
-                    self.tileset_viewer.setTileSize(
-                        self.settings_panel.tile_width_spin.value(),
-                        self.settings_panel.tile_height_spin.value(),
-                        self.settings_panel.tile_spacing_spin.value()
-                    )
+        self.current_tileset = image
+        self.current_tileset_name = name
 
-                # Set initial render mode
-                render_mode = self.render_mode_combo.currentData()
-                self.tileset_viewer.setRenderMode(render_mode)
-                self.tile_preview.setRenderMode(render_mode)
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        pixmap = QPixmap()
+        pixmap.loadFromData(buffer.getvalue())
 
-                self.tileset_viewer.setPixmap(pixmap)
-                self.tileset_viewer.updateGrid()
+        # Every sheet keeps its own slicing, the spinboxes follow the one on display
+        self.show_geometry(*self.sheet_geometry(name))
 
-            except Exception as e:
-                self.tileset_viewer.setText(f"Error loading tileset: {str(e)}")
-                self.current_tileset = None
+        # Set initial render mode
+        render_mode = self.render_mode_combo.currentData()
+        self.tileset_viewer.setRenderMode(render_mode)
+        self.tile_preview.setRenderMode(render_mode)
+
+        self.tileset_viewer.selected_tile = None
+        self.select_tile_id(None)
+        self.tileset_viewer.setPixmap(pixmap)
+        self.tileset_viewer.updateGrid()
+
+        self.watch_check.blockSignals(True)
+        self.watch_check.setChecked(name in self._watched_pixels)
+        self.watch_check.blockSignals(False)
+
+    def remove_current_tileset(self):
+        name = self.current_tileset_name
+        if name is None:
+            return
+
+        sheet = self.atlas.sheets.get(name)
+        if sheet is not None:
+            self.tile_properties.forget(sheet.tile_ids())
+            self.atlas.remove_tileset(name)
+        self.set_watching(name, False)
+        del self.tilesets[name]
+        self.tileset_paths.pop(name, None)
+        self.invalidate_tile_data(name)
+        self.current_tileset = None
+        self.current_tileset_name = None
+        self.tileset_combo.removeItem(self.tileset_combo.findText(name))
+        if not self.tilesets:
+            self.tileset_viewer.clearPixmap()
+            self.tile_preview.setTile(None)
+        self.atlasChanged.emit()
+
+    def set_tile_geometry(self, width, height, spacing):
+        """Re-slices the active sheet with a new tile geometry"""
+        name = self.current_tileset_name
+        if name is None:
+            self.tileset_viewer.setTileSize(width, height, spacing)
+            return
+        old_sheet = self.atlas.sheets.get(name)
+        if old_sheet is not None and old_sheet.geometry == (width, height, spacing):
+            return
+        try:
+            self.atlas.add_tileset(name, self.current_tileset, width, height, spacing)
+        except ValueError:
+            # Tile larger than the sheet, keep the slicing it has
+            self.show_geometry(*self.sheet_geometry(name))
+            return
+        # Tile ids change with the geometry, so properties of the old slicing no longer apply
+        if old_sheet is not None:
+            self.tile_properties.forget(old_sheet.tile_ids())
+        self.tileset_viewer.setTileSize(width, height, spacing)
+        self.select_tile_id(None)
+        self.schedule_tile_data(name)
+        self.atlasChanged.emit()
+
+    def on_watch_toggled(self, enabled):
+        if self.current_tileset_name is not None:
+            self.set_watching(self.current_tileset_name, enabled)
+
+    def set_watching(self, name, enabled, path=None):
+        """Starts or stops reloading a sheet whenever its file changes"""
+        old_path = self.tileset_paths.get(name)
+        if old_path and old_path in self.file_watcher.files():
+            self.file_watcher.removePath(old_path)
+        self._watched_pixels.pop(name, None)
+        if path:
+            self.tileset_paths[name] = path
+        path = self.tileset_paths.get(name)
+        if enabled and path:
+            self._watched_pixels[name] = sheet_array(self.tilesets[name])
+            self.file_watcher.addPath(path)
+
+    def on_tileset_file_changed(self, path):
+        for name, watched_path in self.tileset_paths.items():
+            if watched_path == path and name in self._watched_pixels:
+                self._pending_reloads.add(name)
+        self.reload_timer.start()
+
+    def reload_pending_tilesets(self):
+        names, self._pending_reloads = self._pending_reloads, set()
+        for name in names:
+            if name in self._watched_pixels:
+                self.reload_tileset(name)
+
+    def reload_tileset(self, name):
+        """Picks up a watched sheet's new pixels, refreshing only the tiles that changed"""
+        path = self.tileset_paths[name]
+        # Saving by replacing the file drops it from the watcher
+        if os.path.exists(path) and path not in self.file_watcher.files():
+            self.file_watcher.addPath(path)
+        try:
+            image = Image.open(path)
+            image.load()
+        except OSError:
+            # Caught halfway through a write, the next change event brings the rest
+            return
+
+        sheet = self.atlas.sheets.get(name)
+        geometry = self.sheet_geometry(name)
+        comparable = True
+        if is_indexed(self.tilesets[name]):
+            reindexed = reindex_image(image, image_palette(self.tilesets[name]))
+            if reindexed is not None:
+                image = reindexed
+            else:
+                # New colors change the palette, so indices no longer compare
+                image = to_indexed_image(image) or image
+                comparable = False
+
+        pixels = sheet_array(image)
+        indices = None
+        if sheet is not None:
+            if comparable:
+                indices = changed_tiles(self._watched_pixels[name], pixels, *geometry)
+            elif grid_shape(image.width, image.height, *geometry) == (sheet.rows, sheet.columns):
+                # Same grid under a new palette, every tile is rewritten in place
+                indices = np.arange(sheet.tile_count)
+        if indices is None:
+            self.rebuild_tileset(name, image, pixels)
+            return
+        self._watched_pixels[name] = pixels
+        self.tilesets[name] = image
+        if name == self.current_tileset_name:
+            self.current_tileset = image
+        if not len(indices):
+            return
+
+        palette = image_palette(image) if is_indexed(image) else None
+        tile_ids = self.atlas.update_tiles(name, pixels, indices, geometry[2], palette)
+        tile_data = self.tile_data.get(name)
+        if tile_data is not None and tile_data.matches_geometry(*geometry):
+            self.tile_data[name] = update_tile_data(tile_data, pixels, indices)
+            self.tileDataReady.emit(name)
+        else:
+            # A rebuild is in flight from the old image, start it over from the new one
+            self.schedule_tile_data(name)
+
+        if name == self.current_tileset_name:
+            self.tileset_viewer.replaceTiles(pixels, indices, sheet.columns, palette)
+            if self.tileset_viewer.selected_tile and self.selected_tile_id in tile_ids:
+                self.on_tile_selected(*self.tileset_viewer.selected_tile)
+        self.tilesChanged.emit(name, tile_ids)
+
+    def rebuild_tileset(self, name, image, pixels):
+        """Re-slices a sheet whose size changed with the geometry it already had, which
+        renumbers its tiles
+        """
+        old_sheet = self.atlas.sheets.get(name)
+        try:
+            self.atlas.add_tileset(name, image, *self.sheet_geometry(name))
+        except ValueError:
+            # Now smaller than a tile, the last version that fit stays loaded
+            return
+        if old_sheet is not None:
+            self.tile_properties.forget(old_sheet.tile_ids())
+        self._watched_pixels[name] = pixels
+        self.tilesets[name] = image
+        if name == self.current_tileset_name:
+            self.show_tileset(name, force=True)
+        self.schedule_tile_data(name)
+        self.atlasChanged.emit()
+
+    def set_indexed_storage(self, enabled):
+        """Converts every loaded sheet, and the atlas, to or from palette indices"""
+        if not self.atlas.set_indexed(enabled):
+            # The loaded sheets use more than 256 colors between them
+            self.indexed_check.blockSignals(True)
+            self.indexed_check.setChecked(False)
+            self.indexed_check.blockSignals(False)
+            self.indexed_check.setToolTip("The loaded tilesets have more than 256 colors together, "
+                                          "remove some to store them as palette indices")
+            return
+        self.indexed_check.setToolTip("Store tilesets with 256 colors or fewer as palette indices")
+        for name, image in self.tilesets.items():
+            if enabled:
+                image = to_indexed_image(image) or image
+            elif is_indexed(image):
+                image = image.convert("RGBA")
+            self.tilesets[name] = image
+            if name in self._watched_pixels:
+                self._watched_pixels[name] = sheet_array(image)
+            # Tiles are hashed from a different array now
+            self.schedule_tile_data(name)
+        if self.current_tileset_name is not None:
+            self.current_tileset = self.tilesets[self.current_tileset_name]
+
+    def invalidate_tile_data(self, name):
+        """Drops a sheet's tile data and discards any rebuild still in flight"""
+        self.tile_data.pop(name, None)
+        self._tile_data_tokens[name] = self._tile_data_tokens.get(name, 0) + 1
+
+    def schedule_tile_data(self, name):
+        """Rebuilds a sheet's tile data off the GUI thread"""
+        self.invalidate_tile_data(name)
+        worker = TileDataWorker(self._tile_data_tokens[name], name, self.tilesets[name],
+                                *self.sheet_geometry(name))
+        worker.signals.finished.connect(self.on_tile_data_finished)
+        QThreadPool.globalInstance().start(worker)
+
+    def adjacency_rules(self):
+        """Compiles edge-matching rules for the active sheet, or None while its data is not ready"""
+        name = self.current_tileset_name
+        tile_data = self.tile_data.get(name)
+        sheet = self.atlas.sheets.get(name)
+        if tile_data is None or sheet is None:
+            return None
+        return edge_rules(tile_data, sheet.first_id)
+
+    def sample_grid(self, image):
+        """Maps a painted room image to a grid of global tile ids of the active sheet"""
+        name = self.current_tileset_name
+        tile_data = self.tile_data.get(name)
+        sheet = self.atlas.sheets.get(name)
+        if tile_data is None or sheet is None:
+            raise ValueError("Load a tileset before learning rules")
+
+        pixels = image_to_array(image)
+        if is_indexed(self.current_tileset):
+            # Indexed sheets are hashed by palette index, so the sample has to be too
+            try:
+                pixels = remap_colors(pixels, image_palette(self.current_tileset))[..., None]
+            except ValueError:
+                raise ValueError("The sample uses colors that are not in the tileset")
+        sample = compute_tile_data(pixels, sheet.tile_width, sheet.tile_height)
+        return sheet.first_id + match_tiles(tile_data, sample)
+
+    def on_tile_data_finished(self, token, name, tile_data):
+        if self._tile_data_tokens.get(name) != token or name not in self.tilesets:
+            return
+        self.tile_data[name] = tile_data
+        self.tileDataReady.emit(name)
 
     def on_tile_selected(self, row, col):
         if not self.current_tileset:
@@ -326,9 +724,26 @@ class TilesetPanel(BasePanel):
         x = col * (self.tileset_viewer.tile_width + self.tileset_viewer.tile_spacing)
         y = row * (self.tileset_viewer.tile_height + self.tileset_viewer.tile_spacing)
 
-        full_pixmap = self.tileset_viewer.pixmap()
+        full_pixmap = self.tileset_viewer.base_pixmap
         tile_pixmap = full_pixmap.copy(
             QRect(x, y, self.tileset_viewer.tile_width, self.tileset_viewer.tile_height)
         )
 
-        self.tile_preview.setTile(tile_pixmap)
\ No newline at end of file
+        self.tile_preview.setTile(tile_pixmap)
+
+        sheet = self.atlas.sheets.get(self.current_tileset_name)
+        self.select_tile_id(sheet.first_id + row * sheet.columns + col if sheet else None)
+
+    def select_tile_id(self, tile_id):
+        self.selected_tile_id = tile_id
+        for flag, check in self.property_checks.items():
+            check.blockSignals(True)
+            check.setChecked(tile_id is not None and self.tile_properties.has(tile_id, flag))
+            check.setEnabled(tile_id is not None)
+            check.blockSignals(False)
+
+    def on_property_toggled(self, flag, enabled):
+        if self.selected_tile_id is None:
+            return
+        self.tile_properties.set_flag(self.selected_tile_id, flag, enabled)
+        self.tilePropertiesChanged.emit()
\ No newline at end of file
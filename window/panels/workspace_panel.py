@@ -1,17 +1,26 @@
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QLabel, QTreeWidget,
-                               QTreeWidgetItem, QPushButton, QMenu, QHBoxLayout)
+                               QTreeWidgetItem, QPushButton, QMenu, QHBoxLayout, QLineEdit)
 from PySide6.QtCore import Qt, Signal
 from PySide6.QtGui import QAction, QIcon
+from core.room_index import RoomIndex
 from .base_panel import BasePanel
 
+# Item data role holding the room's key in the tile index
+ROOM_KEY_ROLE = Qt.UserRole + 1
+
 
 class WorkspaceTree(QTreeWidget):
     """Tree widget for displaying workspaces and rooms"""
     roomSelected = Signal(str, str)
+    roomGridSelected = Signal(object)
 
     def __init__(self):
         super().__init__()
+        self.room_index = RoomIndex()  # Tile usage of every room with a grid in the project
+        self._room_items = {}
+        self._next_room_key = 0
         self.setHeaderHidden(True)
+        self.itemClicked.connect(self.on_item_clicked)
         self.setStyleSheet("""
             QTreeWidget {
                 background-color: #1E1E1E;
@@ -89,13 +98,80 @@ class WorkspaceTree(QTreeWidget):
         workspace_item.setExpanded(True)
         self.editItem(room)
 
+    def on_item_clicked(self, item, column):
+        if item.parent() is None:
+            return
+        self.roomSelected.emit(item.parent().text(0), item.text(0))
+        grid = item.data(0, Qt.UserRole)
+        if grid is not None:
+            self.roomGridSelected.emit(grid)
+
+    def target_workspace(self):
+        """Returns the selected workspace, or the one holding the selected room. Without a
+        selection, rooms go to the Generated workspace, created on first use
+        """
+        item = self.currentItem()
+        if item is not None and item.parent() is not None:
+            item = item.parent()
+        if item is None:
+            found = self.findItems("🗀 Generated", Qt.MatchExactly)
+            if found:
+                item = found[0]
+            else:
+                item = QTreeWidgetItem(self)
+                item.setText(0, "🗀 Generated")
+                item.setExpanded(True)
+            self.setCurrentItem(item)
+        return item
+
+    def add_room(self, workspace_item, name, grid):
+        room = QTreeWidgetItem(workspace_item)
+        room.setText(0, f"└ Room: {name}")
+        self.set_room_grid(room, grid)
+        workspace_item.setExpanded(True)
+        return room
+
+    def set_room_grid(self, room_item, grid):
+        """Stores a room's grid and keeps the tile index in step with it"""
+        key = room_item.data(0, ROOM_KEY_ROLE)
+        if key is None:
+            key = self._next_room_key
+            self._next_room_key += 1
+            room_item.setData(0, ROOM_KEY_ROLE, key)
+            self._room_items[key] = room_item
+        room_item.setData(0, Qt.UserRole, grid)
+        self.room_index.update_room(key, grid)
+
+    def forget_room(self, room_item):
+        key = room_item.data(0, ROOM_KEY_ROLE)
+        if key is not None:
+            self.room_index.remove_room(key)
+            self._room_items.pop(key, None)
+
+    def filter_rooms(self, keys):
+        """Shows only the rooms with the given index keys, or everything when keys is None"""
+        keys = None if keys is None else set(keys)
+        for index in range(self.topLevelItemCount()):
+            workspace = self.topLevelItem(index)
+            visible = 0
+            for child in range(workspace.childCount()):
+                room = workspace.child(child)
+                shown = keys is None or room.data(0, ROOM_KEY_ROLE) in keys
+                if room.isHidden() == shown:
+                    room.setHidden(not shown)
+                visible += shown
+            workspace.setHidden(keys is not None and not visible)
+
     def rename_item(self, item):
         self.editItem(item)
 
     def delete_workspace(self, workspace_item):
+        for child in range(workspace_item.childCount()):
+            self.forget_room(workspace_item.child(child))
         self.takeTopLevelItem(self.indexOfTopLevelItem(workspace_item))
 
     def delete_room(self, room_item):
+        self.forget_room(room_item)
         workspace_item = room_item.parent()
         workspace_item.removeChild(room_item)
 
@@ -103,9 +179,30 @@ class WorkspaceTree(QTreeWidget):
 class WorkspacePanel(BasePanel):
     def __init__(self):
         super().__init__("Workspaces")
+        self.tile_groups = {}  # Lowercase name -> tile ids, usable as search terms
         self.init_panel()
 
     def init_panel(self):
+        # Search rooms by the tiles they use, answered from the tile index
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Search rooms: 312, solid > 20%")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.setStyleSheet("""
+            QLineEdit {
+                background-color: #1E1E1E;
+                color: #CCCCCC;
+                border: 1px solid #454545;
+                padding: 3px;
+            }
+        """)
+        self.search_edit.textChanged.connect(self.search_rooms)
+        self.content_layout.addWidget(self.search_edit)
+
+        self.search_status = QLabel()
+        self.search_status.setStyleSheet("color: #999999;")
+        self.search_status.hide()
+        self.content_layout.addWidget(self.search_status)
+
         # Workspace tree
         self.workspace_tree = WorkspaceTree()
         self.content_layout.addWidget(self.workspace_tree)
@@ -126,4 +223,34 @@ class WorkspacePanel(BasePanel):
         room2.setText(0, "└ Room: Treasury")
 
         project2 = QTreeWidgetItem(self.workspace_tree)
-        project2.setText(0, "🗀 Castle Project")
\ No newline at end of file
+        project2.setText(0, "🗀 Castle Project")
+
+    def set_tile_groups(self, groups):
+        self.tile_groups = groups
+        if self.search_edit.text().strip():
+            self.search_rooms(self.search_edit.text())
+
+    def search_rooms(self, text):
+        if not text.strip():
+            self.search_status.hide()
+            self.workspace_tree.filter_rooms(None)
+            return
+        try:
+            keys = self.workspace_tree.room_index.search(text, self.tile_groups)
+        except ValueError as e:
+            self.search_status.setText(str(e))
+            self.search_status.show()
+            return
+        self.search_status.setText(f"{len(keys)} rooms match")
+        self.search_status.show()
+        self.workspace_tree.filter_rooms(keys)
+
+    def add_candidates(self, candidates):
+        """Adds best-of-N results to the selected workspace, best first"""
+        workspace = self.workspace_tree.target_workspace()
+        for candidate in candidates:
+            self.workspace_tree.add_room(
+                workspace, f"Seed {candidate.seed} ({candidate.score:.0%})", candidate.grid
+            )
+        if self.search_edit.text().strip():
+            self.search_rooms(self.search_edit.text())
\ No newline at end of file
@@ -0,0 +1,22 @@
+from PySide6.QtCore import QObject, QRunnable, Signal
+from core.palette import sheet_array
+from core.tileset import compute_tile_data
+
+
+class TileDataSignals(QObject):
+    finished = Signal(int, str, object)
+
+
+class TileDataWorker(QRunnable):
+    """Rebuilds the per-tile data of a sheet on the thread pool"""
+    def __init__(self, token, name, image, tile_width, tile_height, spacing):
+        super().__init__()
+        self.token = token
+        self.name = name
+        self.image = image
+        self.geometry = (tile_width, tile_height, spacing)
+        self.signals = TileDataSignals()
+
+    def run(self):
+        tile_data = compute_tile_data(sheet_array(self.image), *self.geometry)
+        self.signals.finished.emit(self.token, self.name, tile_data)